@@ -1,12 +1,24 @@
-from fastapi import FastAPI
+# Thread budget first: the OpenMP/BLAS pools size themselves when torch/faiss/numpy load
+from runtime_config import configure_runtime
+configure_runtime()
+
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import backend_controller
+import metrics
+import profiler
 from backend_controller import tutor_step
+from prefetcher import get_prefetcher
+from tutor_socket import TutorSession
 
 app = FastAPI()
 
+# Per-stage timings and counters, exposed at GET /metrics
+metrics.instrument_app(app)
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -17,20 +29,69 @@ app.add_middleware(
 
 class UserInput(BaseModel):
     answer: str | None = None
+    wait_for_grading: bool = False  # True: the response reflects this answer's grade
+
+class OnboardingInput(BaseModel):
+    answers: dict[str, str]  # question id -> chosen option
+    topic: str
 
 @app.post("/api/tutor")
-def tutor(input: UserInput):
-    return tutor_step(input.answer)
+def tutor(input: UserInput, request: Request, response: Response):
+    # Debug: `X-Debug-Profile: 1` or `?profile=1` samples this request only
+    with profiler.profile_request(request) as prof:
+        result = tutor_step(input.answer, input.wait_for_grading)
+
+    if prof:
+        result["profile"] = prof.summary()
+        response.headers["X-Profile-Id"] = prof.profile_id
+    return result
+
+@app.get("/api/score_updates")
+def score_updates():
+    # Grades that completed after the last response (polled by the UI between turns)
+    return {"score_updates": backend_controller.GRADING.drain_updates(),
+            "pending_grades": backend_controller.GRADING.pending()}
+
+@app.websocket("/ws/tutor")
+async def tutor_socket(websocket: WebSocket):
+    # Long-lived session channel: turns, pushed score updates, heartbeats
+    await TutorSession(websocket).run()
+
+@app.get("/api/onboarding")
+def onboarding_bundle(request: Request):
+    # All assessment questions + topics in one response; revalidated with If-None-Match.
+    # Whether this learner is onboarded changes without the bundle changing, so it
+    # travels in a header (sent with the 304 too) instead of the ETag'd body.
+    bundle, etag = backend_controller.get_onboarding_bundle()
+    headers = {"ETag": etag, "Cache-Control": "no-cache",
+               "X-Onboarded": "true" if backend_controller.is_onboarded() else "false"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(bundle, headers=headers)
+
+@app.post("/api/onboarding")
+def submit_onboarding(input: OnboardingInput):
+    # One round trip: profile, topic priority and the first lesson
+    try:
+        return backend_controller.submit_onboarding(input.answers, input.topic)
+    except backend_controller.OnboardingError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@app.get("/api/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str):
+    # Collapsed stacks, ready for flamegraph.pl / speedscope
+    stacks = profiler.load_profile(profile_id)
+    if stacks is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return stacks
 
 @app.post("/api/reset")
 def reset_session():
-    # Reset global state for a new session
-    backend_controller.USER_PROFILE = None
-    # Reset scores (optional, but good for a full restart)
-    # Re-initialize scores to default 0.3
-    backend_controller.LEARNER_SCORES = {
-        k: 0.3 for k in backend_controller.LEARNER_SCORES
-    }
+    # Reset global state for a new session (profile, onboarding answers, scores back to 0.3)
+    # and record it in the event log so a restart does not resurrect the old learner
+    backend_controller.reset_learner()
+    # Drop speculative work for the old learner
+    get_prefetcher().clear()
     return {"status": "reset"}
 
 # Serve UI files
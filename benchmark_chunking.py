@@ -0,0 +1,87 @@
+import re
+import random
+import argparse
+import faiss
+from sentence_transformers import SentenceTransformer
+
+from data_processor import split_text_into_chunks, SOURCE_FILE, MODEL_NAME, CHUNK_SIZE, CHUNK_OVERLAP
+from semantic_chunker import chunk_documents
+
+# --- Configuration ---
+TOP_K = 5
+NUM_QUERIES = 150
+SEED = 42
+
+BULLET_RE = re.compile(r"^\s*\*\s+(.+?)\s*$")
+
+
+def build_query_set(text: str, num_queries: int, seed: int) -> list[str]:
+    """
+    Every bullet of the curriculum file is a labeled query: the relevant chunk is any
+    chunk that contains the full bullet text. The parenthesised explanation is dropped
+    from the query so it reads like a learner question.
+    """
+    bullets = [m.group(1) for m in map(BULLET_RE.match, text.splitlines()) if m]
+    random.Random(seed).shuffle(bullets)
+    return bullets[:num_queries]
+
+
+def evaluate_splitter(name: str, chunks: list[str], queries: list[str], model, k: int) -> dict:
+    embeddings = model.encode(chunks, convert_to_numpy=True).astype("float32")
+    index = faiss.IndexFlatL2(embeddings.shape[1])
+    index.add(embeddings)
+
+    query_texts = [q.split(" (")[0] for q in queries]
+    query_embeddings = model.encode(query_texts, convert_to_numpy=True).astype("float32")
+    _, I = index.search(query_embeddings, k)
+
+    hits, reciprocal_ranks = 0, 0.0
+    for query, row in zip(queries, I):
+        for rank, idx in enumerate(row):
+            if query in chunks[idx]:
+                hits += 1
+                reciprocal_ranks += 1.0 / (rank + 1)
+                break
+
+    chunk_bytes = sum(len(c.encode("utf-8")) for c in chunks)
+    return {
+        "splitter": name,
+        "chunks": len(chunks),
+        "text_bytes": chunk_bytes,
+        "index_bytes": index.ntotal * index.d * 4,
+        f"recall@{k}": hits / len(queries),
+        "mrr": reciprocal_ranks / len(queries),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the fixed-window and semantic chunkers.")
+    parser.add_argument("--source", default=SOURCE_FILE)
+    parser.add_argument("--k", type=int, default=TOP_K)
+    parser.add_argument("--queries", type=int, default=NUM_QUERIES)
+    args = parser.parse_args()
+
+    with open(args.source, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    queries = build_query_set(text, args.queries, SEED)
+    print(f"--- Loaded {len(queries)} labeled queries from {args.source} ---")
+
+    model = SentenceTransformer(MODEL_NAME)
+    splitters = {
+        "fixed": split_text_into_chunks(text, "cl100k_base", CHUNK_SIZE, CHUNK_OVERLAP),
+        "semantic": [c["text"] for c in chunk_documents([text], max_tokens=CHUNK_SIZE)[0]],
+    }
+
+    results = [evaluate_splitter(name, chunks, queries, model, args.k) for name, chunks in splitters.items()]
+
+    header = f"{'splitter':<10}{'chunks':>8}{'text KB':>10}{'index KB':>10}{'recall@' + str(args.k):>11}{'mrr':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['splitter']:<10}{r['chunks']:>8}{r['text_bytes'] / 1024:>10.1f}{r['index_bytes'] / 1024:>10.1f}"
+              f"{r[f'recall@{args.k}']:>11.3f}{r['mrr']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
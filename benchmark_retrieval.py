@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import platform
+import numpy as np
+
+# --- Configuration ---
+QUERIES_FILE = "benchmark_queries.json"
+BASELINE_FILE = "benchmark_baseline.json"
+RESULTS_FILE = "benchmark_results.json"
+K_VALUES = (1, 3, 5)
+LATENCY_REPEATS = 20      # Passes over the query set for latency percentiles
+WARMUP_QUERIES = 5
+
+# Allowed drift against the stored baseline before the run fails
+QUALITY_TOLERANCE = 0.02  # absolute drop in recall@k / MRR
+LATENCY_TOLERANCE = 0.25  # relative increase in p50/p95/p99
+THROUGHPUT_TOLERANCE = 0.25  # relative drop in embeddings/sec
+MEMORY_TOLERANCE = 0.20   # relative increase in peak RSS
+
+
+def percentile(values, q):
+    return float(np.percentile(np.array(values), q))
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if platform.system() == "Darwin" else rss / 1024
+
+
+# --- Measurements ---
+def measure_quality(search, queries, max_k):
+    recall = {k: 0.0 for k in K_VALUES}
+    reciprocal_ranks = 0.0
+    misses = []
+
+    for item in queries:
+        relevant = set(item["relevant_ids"])
+        ranked_ids = [chunk["id"] for chunk, _ in search(item["query"], max_k)]
+
+        for k in K_VALUES:
+            recall[k] += len(relevant & set(ranked_ids[:k])) / len(relevant)
+
+        rank = next((i + 1 for i, cid in enumerate(ranked_ids) if cid in relevant), None)
+        if rank:
+            reciprocal_ranks += 1.0 / rank
+        else:
+            misses.append(item["query"])
+
+    n = len(queries)
+    result = {f"recall@{k}": round(recall[k] / n, 4) for k in K_VALUES}
+    result["mrr"] = round(reciprocal_ranks / n, 4)
+    result["misses"] = misses
+    return result
+
+
+def measure_latency(search, queries, max_k, repeats):
+    for item in queries[:WARMUP_QUERIES]:
+        search(item["query"], max_k)
+
+    timings_ms = []
+    for _ in range(repeats):
+        for item in queries:
+            start = time.perf_counter()
+            search(item["query"], max_k)
+            timings_ms.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "samples": len(timings_ms),
+        "p50_ms": round(percentile(timings_ms, 50), 3),
+        "p95_ms": round(percentile(timings_ms, 95), 3),
+        "p99_ms": round(percentile(timings_ms, 99), 3),
+    }
+
+
+def measure_embedding_throughput(model, texts, repeats=3):
+    model.encode(texts[:8], convert_to_numpy=True)
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.encode(texts, convert_to_numpy=True)
+        best = min(best, time.perf_counter() - start)
+    return {"texts": len(texts), "embeddings_per_sec": round(len(texts) / best, 1)}
+
+
+# --- Baseline Comparison ---
+def compare_to_baseline(current, baseline):
+    """Returns a list of human-readable regressions (empty when within tolerance)."""
+    regressions = []
+
+    for key, value in baseline["quality"].items():
+        if key == "misses":
+            continue
+        if current["quality"][key] < value - QUALITY_TOLERANCE:
+            regressions.append(f"{key}: {current['quality'][key]} < baseline {value}")
+
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        limit = baseline["latency"][key] * (1 + LATENCY_TOLERANCE)
+        if current["latency"][key] > limit:
+            regressions.append(f"latency {key}: {current['latency'][key]} > {limit:.3f} (baseline {baseline['latency'][key]})")
+
+    rate, base_rate = current["embedding"]["embeddings_per_sec"], baseline["embedding"]["embeddings_per_sec"]
+    if rate < base_rate * (1 - THROUGHPUT_TOLERANCE):
+        regressions.append(f"embedding throughput: {rate}/s < baseline {base_rate}/s")
+
+    mem, base_mem = current["memory"]["peak_rss_mb"], baseline["memory"]["peak_rss_mb"]
+    if mem > base_mem * (1 + MEMORY_TOLERANCE):
+        regressions.append(f"peak RSS: {mem} MB > baseline {base_mem} MB")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality and latency benchmark over expert_knowledge.json.")
+    parser.add_argument("--queries", default=QUERIES_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--repeats", type=int, default=LATENCY_REPEATS)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="Exit 0 when there is no baseline to compare against (default: fail).")
+    args = parser.parse_args()
+
+    with open(args.queries, encoding="utf-8") as f:
+        queries = json.load(f)
+
+    # The benchmark measures the in-process model and index; in sidecar mode
+    # step5_faiss_demo loads neither. RETRIEVAL_MODE is read at import time.
+    if os.getenv("RETRIEVAL_MODE", "local") != "local":
+        print(f"--- RETRIEVAL_MODE={os.environ['RETRIEVAL_MODE']} ignored: benchmarking local retrieval ---")
+    os.environ["RETRIEVAL_MODE"] = "local"
+
+    print("--- Loading retriever (member2.step5_faiss_demo) ---")
+    start = time.perf_counter()
+    from member2.step5_faiss_demo import search_chunks, model, chunks, index
+    load_seconds = time.perf_counter() - start
+
+    max_k = max(K_VALUES)
+    print(f"--- Running {len(queries)} labeled queries ---")
+    results = {
+        "queries": len(queries),
+        "index_vectors": index.ntotal,
+        "quality": measure_quality(search_chunks, queries, max_k),
+        "latency": measure_latency(search_chunks, queries, max_k, args.repeats),
+        "embedding": measure_embedding_throughput(model, [c["explanation"] for c in chunks]),
+        "memory": {"peak_rss_mb": round(peak_rss_mb(), 1), "load_seconds": round(load_seconds, 2)},
+    }
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    q, lat = results["quality"], results["latency"]
+    print("\n".join([
+        "",
+        "  ".join(f"{k}={v}" for k, v in q.items() if k != "misses"),
+        f"latency p50={lat['p50_ms']}ms p95={lat['p95_ms']}ms p99={lat['p99_ms']}ms ({lat['samples']} samples)",
+        f"embedding throughput={results['embedding']['embeddings_per_sec']}/s  peak RSS={results['memory']['peak_rss_mb']} MB",
+        f"results written to {args.output}",
+    ]))
+    for miss in q["misses"]:
+        print(f"  MISS: {miss}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline updated: {args.baseline}")
+        return
+
+    try:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"\nNo baseline at {args.baseline}. Run with --update-baseline to create one.")
+        # A gate with nothing to compare against must not pass silently
+        sys.exit(0 if args.allow_missing_baseline else 1)
+
+    regressions = compare_to_baseline(results, baseline)
+    if regressions:
+        print("\n❌ REGRESSION against baseline:")
+        for r in regressions:
+            print(f"   - {r}")
+        sys.exit(1)
+    print("\n✅ No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
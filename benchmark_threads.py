@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import random
+import argparse
+import multiprocessing
+
+# numpy / torch / faiss are imported inside the worker processes only: their
+# thread pools size themselves at import time from the environment each
+# profile sets up (see runtime_config.py).
+
+# --------------------------------------------------
+# THREAD BUDGET BENCHMARK
+# --------------------------------------------------
+# Simulates `uvicorn --workers W` with C concurrent requests per worker, every
+# request doing the CPU part of retrieve_context (query embedding + FAISS
+# search), and compares:
+#   default      library defaults: every op in every process uses all cores
+#   latency      runtime_config "latency" profile
+#   throughput   runtime_config "throughput" profile
+#
+# Workloads:
+#   retrieval    the real SentenceTransformer + faiss_index.bin (needs both installed)
+#   synthetic    numpy stand-in with the same shapes (token x 384 encoder matmuls +
+#                a flat L2 scan over CORPUS_SIZE vectors), for machines without torch
+
+QUERIES_FILE = "benchmark_queries.json"
+PROFILES = ("default", "latency", "throughput")
+CORPUS_SIZE = 20000
+DIM = 384
+TOKENS = 32
+
+
+def build_workload(kind: str):
+    """Returns search(query) doing the CPU work of one retrieve_context call."""
+    import numpy as np
+
+    if kind == "retrieval":
+        from retriever import RAGRetriever
+        retriever = RAGRetriever(use_sidecar=False)
+        if not retriever.is_ready:
+            raise SystemExit("Retriever is not ready; build the index first (python data_processor.py).")
+        index = retriever.index
+
+        def search(query):
+            embedding = retriever.model.encode([query], convert_to_numpy=True).astype("float32")
+            return index.search(embedding, 5)
+        return search
+
+    rng = np.random.default_rng(0)
+    layers = [rng.standard_normal((DIM, 4 * DIM), dtype=np.float32),
+              rng.standard_normal((4 * DIM, DIM), dtype=np.float32)]
+    corpus = rng.standard_normal((CORPUS_SIZE, DIM), dtype=np.float32)
+    norms = (corpus ** 2).sum(axis=1)
+
+    def search(query):
+        local = np.random.default_rng(hash(query) & 0xFFFFFFFF)
+        hidden = local.standard_normal((TOKENS, DIM), dtype=np.float32)
+        for _ in range(6):                               # 6 encoder blocks
+            hidden = np.maximum(hidden @ layers[0], 0) @ layers[1] / DIM
+        embedding = hidden.mean(axis=0)
+        distances = norms - 2 * corpus @ embedding         # flat L2 scan (constant |q|^2 dropped)
+        return np.argpartition(distances, 5)[:5]
+    return search
+
+
+def worker(profile, kind, workers, concurrency, seconds, queries, ready, start, results):
+    if profile != "default":
+        from runtime_config import apply_thread_budget, configure_runtime
+        configure_runtime(profile, workers)
+    search = build_workload(kind)
+    if profile != "default":
+        apply_thread_budget()
+    for query in queries[:3]:
+        search(query)   # warm-up (lazy inits, thread pool start)
+    ready.put(os.getpid())
+    start.wait()
+
+    import threading
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def loop(seed):
+        rng = random.Random(seed)
+        own = []
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            search(rng.choice(queries) + f" #{rng.random()}")   # unique text: no cache can answer it
+            own.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=loop, args=(os.getpid() * 1000 + i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put(latencies)
+
+
+def run_profile(profile, kind, workers, concurrency, seconds, queries) -> dict:
+    import numpy as np
+
+    # Children inherit the environment at spawn: default = no thread limits at all
+    saved = {var: os.environ.pop(var, None) for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")}
+    ctx = multiprocessing.get_context("spawn")
+    ready, results, start = ctx.Queue(), ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=worker, args=(profile, kind, workers, concurrency, seconds, queries, ready, start, results))
+             for _ in range(workers)]
+    try:
+        for p in procs:
+            p.start()
+        for _ in procs:
+            ready.get()
+        start.set()
+        latencies = [lat for _ in procs for lat in results.get()]
+        for p in procs:
+            p.join()
+    finally:
+        for var, value in saved.items():
+            if value is not None:
+                os.environ[var] = value
+
+    lat_ms = np.array(latencies) * 1000
+    return {
+        "profile": profile,
+        "requests": len(latencies),
+        "qps": round(len(latencies) / seconds, 1),
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(lat_ms, 99)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare thread budgets under concurrent retrieval load.")
+    parser.add_argument("--workload", choices=["retrieval", "synthetic"], default="synthetic")
+    parser.add_argument("--workers", type=int, default=2, help="Simulated uvicorn workers (processes).")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requests per worker.")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES))
+    parser.add_argument("--output", help="Write the results as JSON.")
+    args = parser.parse_args()
+
+    with open(QUERIES_FILE, encoding="utf-8") as f:
+        queries = [q["query"] for q in json.load(f)]
+
+    from runtime_config import cpu_count
+    print(f"{cpu_count()} cores, {args.workers} workers x {args.concurrency} concurrent requests, "
+          f"{args.workload} workload, {args.seconds:g}s per profile\n")
+    print(f"{'profile':<12}{'requests':>10}{'qps':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    rows = []
+    for profile in args.profiles:
+        row = run_profile(profile, args.workload, args.workers, args.concurrency, args.seconds, queries)
+        rows.append(row)
+        print(f"{row['profile']:<12}{row['requests']:>10}{row['qps']:>10}{row['p50_ms']:>10}{row['p99_ms']:>10}")
+
+    baseline = next((r for r in rows if r["profile"] == "default"), None)
+    if baseline:
+        for row in rows:
+            if row is not baseline and baseline["qps"]:
+                print(f"{row['profile']}: {row['qps'] / baseline['qps']:.2f}x QPS, "
+                      f"p99 {row['p99_ms'] / baseline['p99_ms']:.2f}x of default")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"workload": args.workload, "workers": args.workers,
+                       "concurrency": args.concurrency, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
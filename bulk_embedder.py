@@ -0,0 +1,199 @@
+import os
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from runtime_config import cpu_count
+
+# --------------------------------------------------
+# BULK EMBEDDING FOR INDEX BUILDS
+# --------------------------------------------------
+# model.encode() pads every batch to its longest input, so a corpus mixing
+# one-line and 256-token chunks spends most of its compute on padding, and it
+# runs on one process.
+#
+# 1. Inputs are sorted by estimated length (longest first) and cut into
+#    batches; neighbours have similar lengths, so little padding is needed.
+# 2. Batch size follows a token budget: short buckets get large batches, long
+#    buckets small ones. With --token-budget auto a worker times a few budgets
+#    on the longest inputs and keeps the fastest.
+# 3. A spawn-started process pool encodes the batches (each worker limits torch
+#    to EMBED_THREADS_PER_WORKER threads so the pool does not oversubscribe the
+#    cores) and writes each result straight into its original rows of a
+#    preallocated .npy memmap: no reordering, no full copy in the parent.
+#
+#   python bulk_embedder.py corpus.txt --output embeddings.npy   # one text per line
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBED_THREADS_PER_WORKER = int(os.getenv("EMBED_THREADS_PER_WORKER", "2"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", str(max(1, cpu_count() // EMBED_THREADS_PER_WORKER))))
+MAX_SEQ_TOKENS = 256            # all-MiniLM-L6-v2 truncates longer inputs
+CHARS_PER_TOKEN = 4             # length estimate; only the ordering matters
+MAX_BATCH = 512
+AUTOTUNE_BUDGETS = [2048, 4096, 8192, 16384, 32768]   # padded tokens per batch
+DEFAULT_TOKEN_BUDGET = 8192
+MIN_PARALLEL_TEXTS = 2000       # smaller corpora are encoded in-process (spawning costs more)
+
+
+def estimate_tokens(texts: list[str]) -> np.ndarray:
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    return np.clip(lengths // CHARS_PER_TOKEN + 2, 1, MAX_SEQ_TOKENS)   # +2: [CLS]/[SEP]
+
+
+def plan_batches(lengths: np.ndarray, token_budget: int, max_batch: int = MAX_BATCH) -> list[np.ndarray]:
+    """Row indices per batch: longest first, each batch sized to fit the token budget at its longest input."""
+    order = np.argsort(-lengths, kind="stable")
+    batches, start = [], 0
+    while start < len(order):
+        size = int(np.clip(token_budget // lengths[order[start]], 1, max_batch))
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+def padding_efficiency(lengths: np.ndarray, batches: list[np.ndarray]) -> float:
+    """Real tokens / padded tokens encoded."""
+    padded = sum(int(lengths[b].max()) * len(b) for b in batches)
+    return float(lengths.sum() / padded) if padded else 1.0
+
+
+# --------------------------------------------------
+# WORKER
+# --------------------------------------------------
+_model = None
+_outputs = {}   # path -> memmap opened by this worker
+_normalize = False
+
+
+def init_worker(model_name: str, threads: int, normalize: bool):
+    global _model, _normalize
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from sentence_transformers import SentenceTransformer
+    _model = SentenceTransformer(model_name)
+    _normalize = normalize
+
+
+def encode(texts: list[str]) -> np.ndarray:
+    # One forward pass per planned batch: the batch was already sized for its length bucket
+    return _model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                         normalize_embeddings=_normalize).astype('float32')
+
+
+def encode_into(path: str, rows: np.ndarray, texts: list[str]) -> int:
+    out = _outputs.get(path)
+    if out is None:
+        out = _outputs[path] = np.load(path, mmap_mode="r+")
+    out[rows] = encode(texts)
+    out.flush()
+    return len(rows)
+
+
+def probe(texts: list[str], lengths: list[int]) -> tuple[int, int]:
+    """(fastest token budget on these long inputs, embedding dimension)."""
+    dim = encode(texts[:1]).shape[1]
+    best_budget, best_rate = DEFAULT_TOKEN_BUDGET, 0.0
+    for budget in AUTOTUNE_BUDGETS:
+        size = int(np.clip(budget // max(lengths[0], 1), 1, min(MAX_BATCH, len(texts))))
+        encode(texts[:size])                      # warm-up at this shape
+        start = time.perf_counter()
+        encode(texts[:size])
+        rate = size / (time.perf_counter() - start)
+        if rate < best_rate * 1.05:
+            break                                 # bigger batches stopped paying off
+        best_budget, best_rate = budget, rate
+        if size == len(texts):
+            break
+    return best_budget, dim
+
+
+# --------------------------------------------------
+# DRIVER
+# --------------------------------------------------
+def embed_corpus(texts: list[str], output_path: str, model_name: str = MODEL_NAME, workers: int = EMBED_WORKERS,
+                 token_budget: int | str = "auto", normalize: bool = False, report: dict | None = None) -> np.ndarray:
+    """
+    Embeds `texts` into a float32 .npy memmap at `output_path` (row i = texts[i])
+    and returns it opened read-only. `report` (optional dict) receives the throughput numbers.
+    """
+    if not texts:
+        raise ValueError("Nothing to embed.")
+    start = time.perf_counter()
+    lengths = estimate_tokens(texts)
+    longest = [int(i) for i in np.argsort(-lengths, kind="stable")[:MAX_BATCH]]
+    sample, sample_lengths = [texts[i] for i in longest], [int(lengths[i]) for i in longest]
+
+    workers = 1 if len(texts) < MIN_PARALLEL_TEXTS else max(1, workers)
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=init_worker, initargs=(model_name, EMBED_THREADS_PER_WORKER, normalize))
+    else:
+        init_worker(model_name, cpu_count(), normalize)   # cores this process may use, not the host's
+
+    try:
+        tuned, dim = pool.submit(probe, sample, sample_lengths).result() if pool else probe(sample, sample_lengths)
+        budget = tuned if token_budget == "auto" else int(token_budget)
+        batches = plan_batches(lengths, budget)
+
+        out = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float32, shape=(len(texts), dim))
+        del out  # allocated on disk; rows are written by whoever encodes them
+
+        encode_start = time.perf_counter()
+        if pool:
+            futures = [pool.submit(encode_into, output_path, rows, [texts[i] for i in rows]) for rows in batches]
+            done = (future.result() for future in as_completed(futures))
+        else:
+            done = (encode_into(output_path, rows, [texts[i] for i in rows]) for rows in batches)
+        embedded, next_report = 0, 0.1
+        for count in done:
+            embedded += count
+            if embedded >= next_report * len(texts):
+                print(f"   {embedded}/{len(texts)} chunks ({embedded / (time.perf_counter() - encode_start):.0f}/s)")
+                next_report = embedded / len(texts) + 0.1
+        encode_seconds = time.perf_counter() - encode_start
+    finally:
+        if pool:
+            pool.shutdown()
+        _outputs.pop(output_path, None)
+
+    unsorted = [np.arange(i, min(i + 32, len(texts))) for i in range(0, len(texts), 32)]   # model.encode default
+    stats = {
+        "chunks": len(texts),
+        "dimension": dim,
+        "workers": workers,
+        "token_budget": budget,
+        "batches": len(batches),
+        "padding_efficiency": round(padding_efficiency(lengths, batches), 3),
+        "padding_efficiency_unsorted": round(padding_efficiency(lengths, unsorted), 3),
+        "encode_seconds": round(encode_seconds, 2),
+        "total_seconds": round(time.perf_counter() - start, 2),
+        "chunks_per_second": round(len(texts) / encode_seconds, 1) if encode_seconds else None,
+    }
+    if report is not None:
+        report.update(stats)
+    print(f"Embedded {stats['chunks']} chunks in {stats['encode_seconds']}s = {stats['chunks_per_second']} chunks/s "
+          f"({workers} worker(s), token budget {budget}, {len(batches)} batches, padding efficiency "
+          f"{stats['padding_efficiency']:.0%} vs {stats['padding_efficiency_unsorted']:.0%} unsorted)")
+    return np.load(output_path, mmap_mode="r")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed a corpus (one text per line) into an .npy file.")
+    parser.add_argument("input", help="UTF-8 text file, one chunk per line.")
+    parser.add_argument("--output", default="embeddings.npy")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS)
+    parser.add_argument("--token-budget", default="auto", help="Padded tokens per batch, or 'auto'.")
+    parser.add_argument("--normalize", action="store_true", help="L2-normalize (for inner-product indexes).")
+    args = parser.parse_args()
+
+    with open(args.input, encoding="utf-8") as f:
+        corpus = [line.rstrip("\n") for line in f if line.strip()]
+    embed_corpus(corpus, args.output, args.model, args.workers, args.token_budget, args.normalize)
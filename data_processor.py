@@ -1,18 +1,22 @@
 import os
+import json
 import pickle
 import faiss
-import numpy as np
 import tiktoken
-from sentence_transformers import SentenceTransformer
-from tqdm import tqdm
+from semantic_chunker import chunk_documents
+from bulk_embedder import EMBED_WORKERS, embed_corpus
+from dedup import DEDUP_ENABLED, dedup_texts, print_report
 
 # --- Configuration ---
 SOURCE_FILE = "Machine-learning-all-topics.txt"
 INDEX_FILE = "faiss_index.bin"
 CHUNKS_FILE = "text_chunks.pkl"
+PROVENANCE_FILE = "text_chunks_provenance.json" # which dropped near-duplicates each kept chunk stands for
+EMBEDDINGS_FILE = "embeddings.npy" # memmap written by bulk_embedder.py (kept to rebuild the index without re-embedding)
 MODEL_NAME = 'all-MiniLM-L6-v2' # A highly efficient, small, and powerful embedding model
 CHUNK_SIZE = 512
 CHUNK_OVERLAP = 50
+CHUNKING_STRATEGY = "semantic" # "semantic" (heading/paragraph/sentence aware) or "fixed" (legacy token windows)
 
 # --- Helper Function for Token-based Text Splitting ---
 def split_text_into_chunks(text: str, model_name: str, chunk_size: int, chunk_overlap: int):
@@ -47,21 +51,32 @@ def process_data():
         print(f"An error occurred while reading the file: {e}")
         return
 
-    print("--- 2. Splitting text into chunks (using tiktoken) ---")
-    text_chunks = split_text_into_chunks(full_text, "cl100k_base", CHUNK_SIZE, CHUNK_OVERLAP)
+    print(f"--- 2. Splitting text into chunks (using tiktoken, strategy: {CHUNKING_STRATEGY}) ---")
+    if CHUNKING_STRATEGY == "semantic":
+        text_chunks = [c["text"] for c in chunk_documents([full_text], max_tokens=CHUNK_SIZE)[0]]
+    else:
+        text_chunks = split_text_into_chunks(full_text, "cl100k_base", CHUNK_SIZE, CHUNK_OVERLAP)
     print(f"Generated {len(text_chunks)} text chunks.")
 
-    print(f"--- 3. Loading Sentence Transformer model: {MODEL_NAME} ---")
-    # This automatically downloads the model if not cached
-    model = SentenceTransformer(MODEL_NAME)
-    
-    print("--- 4. Generating embeddings and building FAISS index ---")
-    
-    # Generate embeddings for all text chunks (using tqdm for progress bar)
-    embeddings = model.encode(text_chunks, show_progress_bar=True, convert_to_numpy=True)
-    
-    # Ensure the embeddings are float32, which is required by FAISS
-    embeddings = np.array(embeddings).astype('float32')
+    if DEDUP_ENABLED:
+        print("--- 2b. Removing near-duplicate chunks (MinHash LSH) ---")
+        keep, clusters, report = dedup_texts(text_chunks)
+        print_report(report)
+        position = {old: new for new, old in enumerate(keep)}
+        provenance = {
+            "report": report,
+            "clusters": [{"chunk": position[rep], "source_position": rep, "duplicate_positions": dupes}
+                         for rep, dupes in sorted(clusters.items())],
+        }
+        with open(PROVENANCE_FILE, "w", encoding="utf-8") as f:
+            json.dump(provenance, f, indent=2)
+        text_chunks = [text_chunks[i] for i in keep]
+
+    print(f"--- 3. Embedding with {MODEL_NAME} (length-bucketed, {EMBED_WORKERS} worker(s)) ---")
+    # Sorted into length buckets, batch size tuned automatically, rows written in order to EMBEDDINGS_FILE
+    embeddings = embed_corpus(text_chunks, EMBEDDINGS_FILE, MODEL_NAME)
+
+    print("--- 4. Building FAISS index ---")
 
     # Get the dimension of the vectors (e.g., all-MiniLM-L6-v2 produces 384 dimensions)
     d = embeddings.shape[1] 
@@ -76,13 +91,17 @@ def process_data():
 
     print("--- 5. Saving index and text chunks to disk ---")
     
-    # Save the FAISS index
-    faiss.write_index(index, INDEX_FILE)
+    # Write to temp files and rename, so a running server's watcher (knowledge_store.py)
+    # never loads a half-written index; it also checks both files describe the same corpus.
+    faiss.write_index(index, INDEX_FILE + ".tmp")
     
     # Save the corresponding text chunks using pickle
-    with open(CHUNKS_FILE, 'wb') as f:
+    with open(CHUNKS_FILE + ".tmp", 'wb') as f:
         pickle.dump(text_chunks, f)
 
+    os.replace(INDEX_FILE + ".tmp", INDEX_FILE)
+    os.replace(CHUNKS_FILE + ".tmp", CHUNKS_FILE)
+
     print("\n✅ Data processing complete.")
     print(f"   - Index saved to: {INDEX_FILE}")
     print(f"   - Chunks saved to: {CHUNKS_FILE}")
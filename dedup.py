@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import zlib
+import pickle
+import argparse
+
+import numpy as np
+
+from topic_matcher import tokenize
+
+# --------------------------------------------------
+# NEAR-DUPLICATE CHUNK ELIMINATION (MINHASH + LSH)
+# --------------------------------------------------
+# Overlapping token windows, repeated page chrome in the scikit-learn HTML and
+# re-ingested copies of the same text produce chunks that differ by a few
+# words. They bloat the index and crowd the top-k with the same context.
+#
+# 1. Every chunk becomes a set of word 5-gram shingles, summarized by a
+#    MinHash signature (NUM_PERM hash minimums; the share of equal positions
+#    estimates the Jaccard similarity of two chunks).
+# 2. Signatures are cut into BANDS bands; chunks sharing any whole band land in
+#    the same LSH bucket. Only bucket members are compared, and only against the
+#    bucket's first member, so the cost stays linear in the number of chunks.
+# 3. Pairs with estimated Jaccard >= DEDUP_THRESHOLD are merged with
+#    union-find. Each cluster keeps its longest chunk, which records the
+#    positions (and ids, when chunks have them) of the copies it replaced.
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") == "1"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))   # estimated Jaccard of the shingle sets
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+BANDS = 16                     # 16 bands x 8 rows: pairs above ~0.7 Jaccard almost always collide
+PRIME = (1 << 31) - 1          # a * hash stays below 2**63: no uint64 overflow
+SEED = 42
+
+_rng = np.random.default_rng(SEED)
+_A = _rng.integers(1, PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, PRIME, NUM_PERM, dtype=np.uint64)
+
+
+def shingle_hashes(text: str, k: int = SHINGLE_WORDS) -> np.ndarray:
+    """32-bit hashes of the word k-grams (rolling combination of per-word crc32s)."""
+    words = np.array([zlib.crc32(w.encode("utf-8")) for w in tokenize(text)], dtype=np.uint64)
+    if len(words) == 0:
+        return np.zeros(1, dtype=np.uint64)
+    k = min(k, len(words))
+    n = len(words) - k + 1
+    hashes = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        hashes = (hashes * np.uint64(1000003) + words[j:j + n]) & np.uint64(0xFFFFFFFF)
+    return np.unique(hashes)
+
+
+def minhash(text: str) -> np.ndarray:
+    hashes = shingle_hashes(text)
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % PRIME).min(axis=1)
+
+
+class UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def find_clusters(texts: list[str], threshold: float = DEDUP_THRESHOLD) -> dict[int, list[int]]:
+    """{representative index: [indices of the near-duplicates it replaces]} for every cluster of 2+ chunks."""
+    signatures = np.stack([minhash(t) for t in texts]) if texts else np.zeros((0, NUM_PERM), dtype=np.uint64)
+    rows = NUM_PERM // BANDS
+    uf = UnionFind(len(texts))
+
+    for band in range(BANDS):
+        buckets = {}
+        for i, key in enumerate(map(bytes, signatures[:, band * rows:(band + 1) * rows])):
+            anchor = buckets.setdefault(key, i)
+            if anchor != i and uf.find(anchor) != uf.find(i):
+                if np.mean(signatures[anchor] == signatures[i]) >= threshold:
+                    uf.union(anchor, i)
+
+    members = {}
+    for i in range(len(texts)):
+        members.setdefault(uf.find(i), []).append(i)
+
+    clusters = {}
+    for group in members.values():
+        if len(group) > 1:
+            keep = max(group, key=lambda i: (len(texts[i]), -i))   # longest, earliest on ties
+            clusters[keep] = [i for i in group if i != keep]
+    return clusters
+
+
+def shrinkage_report(before: int, after: int, clusters: dict, dim: int = 384) -> dict:
+    removed = before - after
+    return {
+        "chunks_before": before,
+        "chunks_after": after,
+        "removed": removed,
+        "clusters": len(clusters),
+        "shrinkage": round(removed / before, 4) if before else 0.0,
+        "index_bytes_saved": removed * dim * 4,   # float32 vectors of a flat index
+    }
+
+
+def dedup_texts(texts: list[str], threshold: float = DEDUP_THRESHOLD) -> tuple[list[int], dict, dict]:
+    """(kept indices in original order, clusters, report)."""
+    clusters = find_clusters(texts, threshold)
+    dropped = {i for dupes in clusters.values() for i in dupes}
+    keep = [i for i in range(len(texts)) if i not in dropped]
+    return keep, clusters, shrinkage_report(len(texts), len(keep), clusters)
+
+
+def dedup_chunks(chunks: list[dict], text_key: str = "text", threshold: float = DEDUP_THRESHOLD) -> tuple[list[dict], dict]:
+    """
+    Drops near-duplicate chunk dicts. A kept representative gets "duplicates":
+    the ids (or original positions) of the chunks it replaced, plus their
+    "sources" when chunks carry a source/shard.
+    """
+    keep, clusters, report = dedup_texts([c[text_key] for c in chunks], threshold)
+    result = []
+    for i in keep:
+        chunk = chunks[i]
+        if i in clusters:
+            dupes = [chunks[j] for j in clusters[i]]
+            chunk = {**chunk, "duplicates": [d.get("id", j) for d, j in zip(dupes, clusters[i])]}
+            sources = sorted({d.get("source") or d.get("shard") for d in dupes} - {None})
+            if sources:
+                chunk["duplicate_sources"] = sources
+        result.append(chunk)
+    print_report(report)
+    return result, report
+
+
+def print_report(report: dict):
+    print(f"Dedup: {report['chunks_before']} -> {report['chunks_after']} chunks "
+          f"({report['removed']} near-duplicates in {report['clusters']} clusters removed, "
+          f"index {report['shrinkage']:.1%} smaller)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report near-duplicate chunks in a chunk file.")
+    parser.add_argument("path", help="text_chunks.pkl (list of strings) or a chunks .json (content/text/explanation).")
+    parser.add_argument("--threshold", type=float, default=DEDUP_THRESHOLD)
+    parser.add_argument("--show", type=int, default=3, help="Example clusters to print.")
+    args = parser.parse_args()
+
+    if args.path.endswith(".pkl"):
+        with open(args.path, "rb") as f:
+            texts = pickle.load(f)
+    else:
+        with open(args.path, encoding="utf-8") as f:
+            texts = [c.get("content") or c.get("text") or c.get("explanation", "") for c in json.load(f)]
+
+    keep, clusters, report = dedup_texts(texts, args.threshold)
+    print_report(report)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    for rep, dupes in list(clusters.items())[:args.show]:
+        print(f"\n[kept #{rep}] {texts[rep][:120]!r}")
+        for j in dupes[:3]:
+            print(f"   [dropped #{j}] {texts[j][:120]!r}")
@@ -0,0 +1,212 @@
+import os
+import glob
+import json
+import time
+import atexit
+import threading
+
+from metrics import inc, observe
+
+# --------------------------------------------------
+# APPEND-ONLY LEARNER EVENT LOG
+# --------------------------------------------------
+# Every onboarding answer, profile lock, topic selection, evaluation and reset
+# is appended as one JSON line. append() only queues the event; a background
+# writer group-commits everything queued since the last batch with a single
+# write + fsync, so the request path never waits on the disk.
+#
+# The writer also folds events into the materialized state (apply_event) and
+# every SNAPSHOT_EVERY events writes it as a compact snapshot and starts a new
+# log segment. Recovery = latest snapshot + replay of the segments after it.
+#
+#   event_log/
+#     snapshot.json              {"seq": N, "state": {...}}
+#     events-<first seq>.jsonl   one event per line
+
+EVENT_LOG_ENABLED = os.getenv("EVENT_LOG_ENABLED", "1") == "1"
+EVENT_LOG_DIR = os.getenv("EVENT_LOG_DIR", "event_log")
+FLUSH_INTERVAL = float(os.getenv("EVENT_LOG_FLUSH_MS", "50")) / 1000   # max batching delay
+SNAPSHOT_EVERY = int(os.getenv("EVENT_LOG_SNAPSHOT_EVERY", "500"))     # events between snapshots
+
+SNAPSHOT_FILE = "snapshot.json"
+SEGMENT_PATTERN = "events-{:012d}.jsonl"
+
+
+# --------------------------------------------------
+# STATE REDUCER
+# --------------------------------------------------
+def new_learner() -> dict:
+    return {"onboarding": {}, "profile": None, "topic_selected": False, "scores": {}}
+
+
+def apply_event(state: dict, event: dict) -> dict:
+    """Folds one event into {"learners": {id: learner}}. Scores are stored absolute, so replay needs no scoring code."""
+    learner = state["learners"].setdefault(event["learner"], new_learner())
+    kind = event["type"]
+    if kind == "onboarding_answer":
+        learner["onboarding"][event["question_id"]] = event["answer"]
+    elif kind == "profile":
+        learner["profile"] = event["profile"]
+    elif kind == "topic_selected":
+        learner["topic_selected"] = True
+        learner["scores"][event["subtopic"]] = event["score"]
+    elif kind == "evaluation":
+        learner["scores"][event["subtopic"]] = event["score"]
+    elif kind == "reset":
+        state["learners"][event["learner"]] = new_learner()
+    return state
+
+
+# --------------------------------------------------
+# LOG
+# --------------------------------------------------
+class EventLog:
+    def __init__(self, directory: str = EVENT_LOG_DIR, flush_interval: float = FLUSH_INTERVAL,
+                 snapshot_every: int = SNAPSHOT_EVERY):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+
+        self.state, self.seq = self._recover()
+        self._snapshot_seq = self.seq
+        self._segment = open(os.path.join(directory, SEGMENT_PATTERN.format(self.seq + 1)), "a", encoding="utf-8")
+
+        self._pending = []
+        self._durable_seq = self.seq
+        self._closed = False
+        self._cond = threading.Condition()
+        self._writer = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+        self._writer.start()
+
+    # --- recovery ---
+    def _recover(self):
+        state, seq = {"learners": {}}, 0
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            state, seq = snapshot["state"], snapshot["seq"]
+
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.directory, "events-*.jsonl"))):
+            with open(path, "rb+") as f:
+                offset = 0
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # Torn last line of a crash: cut it so new appends stay readable
+                        f.truncate(offset)
+                        print(f"Event log {path}: dropped a torn record at byte {offset}")
+                        break
+                    offset += len(line)
+                    if event["seq"] > seq:
+                        apply_event(state, event)
+                        seq = event["seq"]
+                        replayed += 1
+        print(f"Event log {self.directory}: recovered to seq {seq} ({replayed} events replayed after the snapshot)")
+        return state, seq
+
+    # --- request path ---
+    def append(self, learner: str, kind: str, **fields) -> int:
+        """Queues one event and returns its sequence number. Never blocks on I/O."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Event log is closed.")
+            self.seq += 1
+            self._pending.append({"seq": self.seq, "ts": round(time.time(), 3), "learner": learner,
+                                  "type": kind, **fields})
+            if len(self._pending) == 1:
+                self._cond.notify()
+            return self.seq
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Blocks until everything appended so far is fsynced."""
+        with self._cond:
+            target = self.seq
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._durable_seq >= target, timeout)
+
+    def learner_state(self, learner: str) -> dict:
+        """Materialized state as of the last durable batch."""
+        with self._cond:
+            return json.loads(json.dumps(self.state["learners"].get(learner, new_learner())))
+
+    # --- background writer ---
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending and self._closed:
+                    return
+            # Let a burst of appends join this batch
+            time.sleep(self.flush_interval)
+            with self._cond:
+                batch, self._pending = self._pending, []
+            self._commit(batch)
+
+    def _commit(self, batch):
+        start = time.perf_counter()
+        self._segment.write("".join(json.dumps(e, separators=(",", ":")) + "\n" for e in batch))
+        self._segment.flush()
+        os.fsync(self._segment.fileno())
+        observe("event_log_commit_seconds", time.perf_counter() - start)
+        inc("event_log_events_total", len(batch))
+
+        with self._cond:
+            for event in batch:
+                apply_event(self.state, event)
+            self._durable_seq = batch[-1]["seq"]
+            self._cond.notify_all()
+
+        if self._durable_seq - self._snapshot_seq >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        """
+        Writes the materialized state, starts a new segment and drops segments the
+        previous snapshot already covered. Runs on the writer thread.
+        """
+        with self._cond:
+            payload = json.dumps({"seq": self._durable_seq, "state": self.state}, separators=(",", ":"))
+            seq = self._durable_seq
+
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+
+        self._segment.close()
+        self._segment = open(os.path.join(self.directory, SEGMENT_PATTERN.format(seq + 1)), "a", encoding="utf-8")
+        for old in glob.glob(os.path.join(self.directory, "events-*.jsonl")):
+            if int(os.path.basename(old)[7:19]) <= self._snapshot_seq:
+                os.remove(old)  # fully covered by the previous snapshot too
+        self._snapshot_seq = seq
+        inc("event_log_snapshots_total")
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        self._segment.close()
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_event_log() -> EventLog | None:
+    """Process-wide log (None when EVENT_LOG_ENABLED=0). Flushed at interpreter exit."""
+    global _log
+    if not EVENT_LOG_ENABLED:
+        return None
+    if _log is None:
+        with _log_lock:
+            if _log is None:
+                _log = EventLog()
+                atexit.register(_log.close)
+    return _log
@@ -0,0 +1,168 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from member3.initial_assessment import get_initial_questions
+from member3.profile_rules import PERSONAS
+from member4.gemini_explainer import build_prompt, explain_chunk
+from metrics import record_cache
+
+# --------------------------------------------------
+# PRECOMPUTED EXPLANATION PACK
+# --------------------------------------------------
+# The curriculum is static and the explainer prompt only varies by
+# (chunk, persona, intent), so every explanation + checkpoint question can be
+# generated offline. tutor_step serves hits from memory and only calls the
+# LLM for misses.
+#
+# Each entry stores the SHA-256 of the exact prompt it was generated from.
+# Editing a chunk or the prompt template changes the hash, so stale entries
+# are ignored automatically and regenerated on the next build.
+
+PACK_FILE = os.getenv("EXPLANATION_PACK", "explanation_pack.json.gz")
+PACK_FORMAT_VERSION = 1
+DEFAULT_CONCURRENCY = 4
+
+
+def get_intents() -> list[str]:
+    """The intent options of the onboarding question (q5_intent)."""
+    return next(q["options"] for q in get_initial_questions() if q["id"] == "q5_intent")
+
+
+def prompt_hash(chunk, persona, intent) -> str:
+    # Same arguments tutor_step passes to explain_chunk (mastery_level = persona)
+    prompt = build_prompt(chunk=chunk, persona=persona, intent=intent, mastery_level=persona)
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def entry_key(chunk, persona, intent) -> str:
+    return f"{chunk['id']}|{persona}|{intent}"
+
+
+# --------------------------------------------------
+# RUNTIME LOOKUP
+# --------------------------------------------------
+class ExplanationPack:
+    def __init__(self, entries: dict | None = None, meta: dict | None = None):
+        self.entries = entries or {}
+        self.meta = meta or {}
+
+    @classmethod
+    def load(cls, path: str = PACK_FILE) -> "ExplanationPack":
+        if not os.path.exists(path):
+            return cls()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format_version") != PACK_FORMAT_VERSION:
+            print(f"Ignoring explanation pack {path}: unsupported format version {data.get('format_version')}")
+            return cls()
+        print(f"Loaded explanation pack {path}: {len(data['entries'])} entries (built {data.get('built_at')})")
+        return cls(data["entries"], {k: v for k, v in data.items() if k != "entries"})
+
+    def save(self, path: str = PACK_FILE):
+        data = {
+            "format_version": PACK_FORMAT_VERSION,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "entries": self.entries,
+        }
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)  # readers never see a half-written pack
+
+    def has(self, chunk, persona, intent) -> bool:
+        """Up-to-date entry present (no cache metrics recorded)."""
+        entry = self.entries.get(entry_key(chunk, persona, intent))
+        return entry is not None and entry["prompt_hash"] == prompt_hash(chunk, persona, intent)
+
+    def lookup(self, chunk, persona, intent) -> dict | None:
+        """Returns {"explanation", "question"} or None on a miss / stale entry."""
+        hit = self.has(chunk, persona, intent)
+        record_cache("explanation_pack", hit)
+        if not hit:
+            return None
+        entry = self.entries[entry_key(chunk, persona, intent)]
+        return {"explanation": entry["explanation"], "question": entry["question"]}
+
+
+_pack = None
+_pack_lock = threading.Lock()
+
+
+def get_pack() -> ExplanationPack:
+    """Process-wide pack, loaded on first use (an empty pack when the file is missing)."""
+    global _pack
+    if _pack is None:
+        with _pack_lock:
+            if _pack is None:
+                _pack = ExplanationPack.load()
+    return _pack
+
+
+# --------------------------------------------------
+# OFFLINE BUILD
+# --------------------------------------------------
+def build_pack(knowledge: list[dict], output: str = PACK_FILE, concurrency: int = DEFAULT_CONCURRENCY,
+               rebuild: bool = False) -> ExplanationPack:
+    """
+    Generates every (chunk, persona, intent) explanation with at most `concurrency`
+    LLM calls in flight. Up-to-date entries of an existing pack are kept, so an
+    interrupted or incremental build only pays for what is missing.
+    """
+    pack = ExplanationPack() if rebuild else ExplanationPack.load(output)
+    jobs = []
+    for chunk in knowledge:
+        for persona in PERSONAS:
+            for intent in get_intents():
+                expected = prompt_hash(chunk, persona, intent)
+                current = pack.entries.get(entry_key(chunk, persona, intent))
+                if current is None or current["prompt_hash"] != expected:
+                    jobs.append((chunk, persona, intent, expected))
+
+    total = len(knowledge) * len(PERSONAS) * len(get_intents())
+    print(f"--- {total - len(jobs)} of {total} entries up to date, generating {len(jobs)} ---")
+
+    def generate(job):
+        chunk, persona, intent, expected = job
+        response = explain_chunk(chunk=chunk, persona=persona, intent=intent, mastery_level=persona)
+        return entry_key(chunk, persona, intent), {**response, "prompt_hash": expected}
+
+    failures = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(generate, job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                key, entry = future.result()
+                pack.entries[key] = entry
+            except Exception as e:
+                failures += 1
+                print(f"   generation failed: {e}")
+            if done % 25 == 0:
+                # Checkpoint so an interrupted build can resume
+                pack.save(output)
+                print(f"   {done}/{len(jobs)} done")
+
+    pack.save(output)
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ Pack written to {output}: {len(pack.entries)} entries, {failures} failures, {elapsed:.1f}s")
+    return pack
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pregenerate explanations for every (chunk, persona, intent).")
+    parser.add_argument("--knowledge", default="expert_knowledge.json")
+    parser.add_argument("--output", default=PACK_FILE)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Max LLM calls in flight.")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the existing pack and regenerate everything.")
+    args = parser.parse_args()
+
+    with open(args.knowledge, encoding="utf-8") as f:
+        knowledge = json.load(f)
+
+    build_pack(knowledge, args.output, args.concurrency, args.rebuild)
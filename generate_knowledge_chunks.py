@@ -10,15 +10,35 @@ OUT = r"C:\TEAM-42\knowledge_processed"
 
 os.makedirs(OUT, exist_ok=True)
 
+HEADING_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6"]
+BLOCK_TAGS = HEADING_TAGS + ["p", "li", "pre", "dt", "dd"]
+
 def clean_text(txt):
-    txt = re.sub(r"\s+", " ", txt).strip()
-    return txt
+    # Collapse whitespace inside paragraphs but keep blank-line paragraph breaks,
+    # so semantic_chunker can still see the document structure.
+    paragraphs = [re.sub(r"\s+", " ", p).strip() for p in re.split(r"\n\s*\n", txt)]
+    return "\n\n".join(p for p in paragraphs if p)
 
 def html_to_text(file_path):
     with open(file_path, "r", encoding="utf-8") as f:
         soup = BeautifulSoup(f, "html.parser")
-        text = soup.get_text(separator="\n")
-    return clean_text(text)
+
+    # Drop navigation and page chrome, it is repeated on every page
+    for tag in soup(["script", "style", "nav", "header", "footer", "aside"]):
+        tag.decompose()
+
+    # Emit headings as markdown headings and every leaf block as its own paragraph
+    blocks = []
+    for el in soup.find_all(BLOCK_TAGS):
+        if el.find(BLOCK_TAGS):
+            continue
+        text = el.get_text(" ", strip=True)
+        if not text:
+            continue
+        if el.name in HEADING_TAGS:
+            text = "#" * int(el.name[1]) + " " + text
+        blocks.append(text)
+    return clean_text("\n\n".join(blocks))
 
 def pdf_to_text(file_path):
     text = extract_text(file_path)
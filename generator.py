@@ -1,6 +1,8 @@
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
 from pydantic import BaseModel, Field
+from llm_provider import LLM_PROVIDER, get_provider
+from llm_client import get_client
+from metrics import span
 import sys # Added for path manipulation in the test block
 
 # --- Pydantic Schema for User Profile (Mock for now) ---
@@ -89,34 +91,27 @@ class RAGGenerator:
     """
     Handles LLM interaction for final answer generation.
     """
-    def __init__(self, model_name: str = "gemini-2.5-flash"):
-        # Use GEMINI_API_KEY environment variable if available
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
+    def __init__(self, model_name: str = "gemini-2.5-flash", temperature: float = 0.3):
+        # Gemini needs GEMINI_API_KEY; other providers (e.g. LLM_PROVIDER=stub) do not
+        if LLM_PROVIDER == "gemini" and not os.getenv("GEMINI_API_KEY"):
             raise ValueError("GEMINI_API_KEY environment variable is not set. Please set it before running.")
-        
-        # Initialize the LLM
-        print(f"Initializing Gemini Model: {model_name}...")
-        self.llm = ChatGoogleGenerativeAI(model=model_name, temperature=0.3, google_api_key=api_key)
+
+        # All calls go through the shared client (pooling, rate limit, retries, circuit breaker, timeout)
+        print(f"Initializing LLM client: {get_provider().name} / {model_name}...")
+        self.llm = get_client()
+        self.model_name = model_name
+        self.temperature = temperature
         print("Generator is ready.")
 
     def generate_response(self, query: str, context: list[str], profile: UserProfile) -> str:
         """
         Generates the LLM response based on context and user profile.
+        Raises llm_provider.LLMError when the LLM cannot answer (callers decide how to degrade).
         """
-        if not self.llm:
-            return "Error: LLM not initialized. Check API Key."
-            
-        adaptive_prompt = build_adaptive_prompt(query, context, profile)
-        
-        try:
-            # Generate the response
-            response = self.llm.invoke(adaptive_prompt)
-            return response.content
-        except Exception as e:
-            # Re-raise or handle the exception more gracefully
-            print(f"An error occurred during LLM invocation: {e}")
-            return f"An error occurred during LLM invocation. The API may be unavailable or the context was insufficient."
+        with span("prompt_build"):
+            adaptive_prompt = build_adaptive_prompt(query, context, profile)
+
+        return self.llm.generate(adaptive_prompt, temperature=self.temperature, model=self.model_name)
 
 
 # --- Example Usage (for testing by single handler) ---
@@ -0,0 +1,133 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import inc, observe
+
+# --------------------------------------------------
+# BACKGROUND ANSWER GRADING
+# --------------------------------------------------
+# Grading an answer used to run inside tutor_step before the next explanation
+# was generated, so any heavier grader (embedding- or LLM-based) added straight
+# to response latency. Now tutor_step submits the answer here and goes on with
+# the best-known scores; a small pool grades in the background.
+#
+# Every submission gets a ticket (increasing sequence number). Results are
+# applied strictly in ticket order, exactly once, however the workers finish,
+# so the EMA score update sees the same sequence as synchronous grading. A
+# reset bumps the epoch: grades of the old learner are dropped, not applied.
+# Applied updates are queued for the client (drain_updates), listeners are
+# notified so a push channel can send them right away, and callers that need
+# strict ordering can wait(ticket).
+
+GRADING_ASYNC = os.getenv("GRADING_ASYNC", "1") == "1"            # 0 = grade inline, as before
+GRADING_WORKERS = int(os.getenv("GRADING_WORKERS", "2"))
+GRADING_MAX_PENDING = int(os.getenv("GRADING_MAX_PENDING", "32"))  # beyond this, submit grades inline
+GRADING_WAIT_MS = float(os.getenv("GRADING_WAIT_MS", "0"))         # default wait per turn before moving on
+MAX_UNSENT_UPDATES = 100
+
+
+class GradingQueue:
+    """
+    grade(payload) -> eval score (runs on a worker)
+    apply(payload, eval_score) -> update dict for the client, or None (runs once per ticket, in order)
+    """
+
+    def __init__(self, grade, apply, workers: int = GRADING_WORKERS, max_pending: int = GRADING_MAX_PENDING,
+                 asynchronous: bool = GRADING_ASYNC):
+        self.grade = grade
+        self.apply = apply
+        self.max_pending = max_pending
+        self.asynchronous = asynchronous
+        self._cond = threading.Condition()
+        self._epoch = 0
+        self._next_ticket = 0
+        self._next_to_apply = 0
+        self._done = {}        # ticket -> (epoch, payload, eval score | None) waiting for earlier tickets
+        self._updates = []     # applied updates not yet sent to the client
+        self._listeners = []   # called (no arguments, on a worker thread) when updates are queued
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="grading")
+
+    def submit(self, payload) -> int:
+        with self._cond:
+            ticket, epoch = self._next_ticket, self._epoch
+            self._next_ticket += 1
+            inline = not self.asynchronous or ticket - self._next_to_apply >= self.max_pending
+        if inline:
+            self._run(ticket, epoch, payload)  # synchronous mode, or back-pressure when the pool is behind
+        else:
+            self._executor.submit(self._run, ticket, epoch, payload)
+        return ticket
+
+    def _run(self, ticket, epoch, payload):
+        start = time.perf_counter()
+        try:
+            eval_score = self.grade(payload)
+        except Exception as e:
+            print(f"Grading error (ticket {ticket}): {e}")
+            inc("grading_total", outcome="error")
+            eval_score = None
+        observe("grading_seconds", time.perf_counter() - start)
+
+        queued = False
+        with self._cond:
+            self._done[ticket] = (epoch, payload, eval_score)
+            # Apply every consecutive finished ticket; the lock serializes score updates
+            while self._next_to_apply in self._done:
+                done_ticket = self._next_to_apply
+                done_epoch, done_payload, score = self._done.pop(done_ticket)
+                self._next_to_apply += 1
+                if score is None:
+                    continue
+                if done_epoch != self._epoch:
+                    inc("grading_total", outcome="stale")   # learner was reset meanwhile
+                    continue
+                try:
+                    update = self.apply(done_payload, score)
+                except Exception as e:
+                    print(f"Applying grade {done_ticket} failed: {e}")
+                    inc("grading_total", outcome="error")
+                    continue
+                inc("grading_total", outcome="applied")
+                if update is not None:
+                    self._updates.append({"ticket": done_ticket, **update})
+                    del self._updates[:-MAX_UNSENT_UPDATES]
+                    queued = True
+            self._cond.notify_all()
+            listeners = list(self._listeners) if queued else []
+        for listener in listeners:
+            try:
+                listener()
+            except Exception as e:
+                print(f"Grading listener failed: {e}")
+
+    def wait(self, ticket: int, timeout: float | None = None) -> bool:
+        """Blocks until `ticket` (and every earlier one) is applied. False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._next_to_apply > ticket, timeout)
+
+    def drain_updates(self) -> list[dict]:
+        """Score updates applied since the last call (sent with the next response)."""
+        with self._cond:
+            updates, self._updates = self._updates, []
+        return updates
+
+    def add_listener(self, listener):
+        with self._cond:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._cond:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def pending(self) -> int:
+        with self._cond:
+            return self._next_ticket - self._next_to_apply
+
+    def reset(self):
+        """New learner: in-flight grades are discarded when they finish."""
+        with self._cond:
+            self._epoch += 1
+            self._updates = []
@@ -0,0 +1,146 @@
+import os
+import json
+import hashlib
+import threading
+
+from metrics import inc
+from topic_matcher import TopicMatcher
+
+# --------------------------------------------------
+# HOT-RELOADABLE KNOWLEDGE ARTIFACTS
+# --------------------------------------------------
+# Every reloadable artifact (expert_knowledge.json, faiss_index.bin +
+# text_chunks.pkl) lives behind a VersionedRef. A request reads the reference
+# ONCE and uses that object until it returns, so it finishes on the version it
+# started with. An ArtifactWatcher thread polls the files' (mtime, size); when
+# they change and then stay unchanged for one more poll (the writer is done),
+# it loads the new version in the background and swaps the reference with a
+# single assignment. A failed load keeps serving the old version.
+
+KNOWLEDGE_RELOAD_ENABLED = os.getenv("KNOWLEDGE_RELOAD_ENABLED", "1") == "1"
+KNOWLEDGE_POLL_SECONDS = float(os.getenv("KNOWLEDGE_POLL_SECONDS", "5"))
+
+
+class VersionedRef:
+    """Holds the current version of an artifact. get() is lock-free; swaps are atomic."""
+
+    def __init__(self, value, version: str):
+        self._current = (value, version)
+
+    def get(self):
+        return self._current[0]
+
+    def get_versioned(self):
+        """(value, version) of the same version."""
+        return self._current
+
+    @property
+    def version(self) -> str:
+        return self._current[1]
+
+    def swap(self, value, version: str):
+        self._current = (value, version)  # one reference assignment: readers see old or new, never a mix
+
+
+def file_signature(paths: list[str]):
+    """(mtime_ns, size) per path; None while any file is missing."""
+    try:
+        return tuple((os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+    except FileNotFoundError:
+        return None
+
+
+def content_version(paths: list[str]) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class ArtifactWatcher(threading.Thread):
+    """
+    Reloads `paths` into `ref` with `loader(paths)` whenever they change.
+    `on_swap(value)` runs after a successful swap (optional).
+    """
+
+    def __init__(self, name: str, paths: list[str], loader, ref: VersionedRef, on_swap=None,
+                 interval: float = KNOWLEDGE_POLL_SECONDS):
+        super().__init__(name=f"watch-{name}", daemon=True)
+        self.artifact = name
+        self.paths = paths
+        self.loader = loader
+        self.ref = ref
+        self.on_swap = on_swap
+        self.interval = interval
+        self._stopped = threading.Event()  # (Thread already uses _stop)
+        self._loaded = file_signature(paths)
+
+    def run(self):
+        pending = None
+        while not self._stopped.wait(self.interval):
+            signature = file_signature(self.paths)
+            if signature is None or signature == self._loaded:
+                pending = None
+                continue
+            if signature != pending:
+                pending = signature  # changed: wait one poll for the writer to finish
+                continue
+            self.reload(signature)
+            pending = None
+
+    def reload(self, signature=None):
+        try:
+            version = content_version(self.paths)
+            if version == self.ref.version:
+                self._loaded = signature or file_signature(self.paths)
+                return
+            print(f"--- {self.artifact}: loading version {version} in the background ---")
+            value = self.loader(self.paths)
+            self.ref.swap(value, version)
+            self._loaded = signature or file_signature(self.paths)
+            inc("knowledge_reloads_total", artifact=self.artifact, outcome="ok")
+            print(f"--- {self.artifact}: now serving version {version} ---")
+            if self.on_swap:
+                self.on_swap(value)
+        except Exception as e:
+            # Keep serving the old version; retried on the next change
+            self._loaded = signature or self._loaded
+            inc("knowledge_reloads_total", artifact=self.artifact, outcome="error")
+            print(f"--- {self.artifact}: reload failed, keeping version {self.ref.version}: {e} ---")
+
+    def stop(self):
+        self._stopped.set()
+
+
+def watch(name: str, paths: list[str], loader, ref: VersionedRef, on_swap=None) -> ArtifactWatcher | None:
+    """Starts a watcher unless KNOWLEDGE_RELOAD_ENABLED=0."""
+    if not KNOWLEDGE_RELOAD_ENABLED:
+        return None
+    watcher = ArtifactWatcher(name, paths, loader, ref, on_swap)
+    watcher.start()
+    return watcher
+
+
+# --------------------------------------------------
+# CURRICULUM (expert_knowledge.json)
+# --------------------------------------------------
+class KnowledgeBase:
+    """One immutable version of expert_knowledge.json and the lookups built from it."""
+
+    def __init__(self, chunks: list[dict], version: str):
+        self.chunks = chunks
+        self.version = version
+        self.subtopics = [chunk["subtopic"] for chunk in chunks]
+        self.by_subtopic = {chunk["subtopic"]: chunk for chunk in chunks}
+        self.by_id = {chunk["id"]: chunk for chunk in chunks if "id" in chunk}
+        self.matcher = TopicMatcher(self.subtopics)
+
+
+def load_knowledge(paths: list[str]) -> KnowledgeBase:
+    with open(paths[0], "r", encoding="utf-8") as f:
+        chunks = json.load(f)
+    if not chunks or any("subtopic" not in c or "explanation" not in c for c in chunks):
+        raise ValueError(f"{paths[0]} has no chunks or chunks without subtopic/explanation")
+    return KnowledgeBase(chunks, content_version(paths))
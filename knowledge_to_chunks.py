@@ -3,52 +3,48 @@ import os
 import json
 import uuid
 
+from semantic_chunker import chunk_documents
+from dedup import DEDUP_ENABLED, dedup_chunks
+
 # Input folder (clean text)
 INPUT_DIR = r"C:\TEAM-42\knowledge_processed"
 
 # Output chunks file (used by FAISS)
 OUTPUT_FILE = r"C:\TEAM-42\member2\chunks.json"
 
-CHUNK_SIZE = 200   # words per chunk
-OVERLAP = 40       # word overlap for context continuity
-
+MAX_CHUNK_TOKENS = 256   # token cap per chunk; chunks end on heading/paragraph/sentence boundaries
 
-def chunk_text(words, size, overlap):
-    chunks = []
-    start = 0
-    while start < len(words):
-        end = start + size
-        chunk_words = words[start:end]
-        chunks.append(" ".join(chunk_words))
-        start = end - overlap
-    return chunks
 
+filenames = [f for f in sorted(os.listdir(INPUT_DIR)) if f.endswith(".clean.txt")]
+documents = []
 
-all_chunks = []
-
-for filename in os.listdir(INPUT_DIR):
-    if not filename.endswith(".clean.txt"):
-        continue
-
+for filename in filenames:
     file_path = os.path.join(INPUT_DIR, filename)
 
     with open(file_path, "r", encoding="utf-8") as f:
-        text = f.read()
+        documents.append(f.read())
 
-    words = text.split()
-    text_chunks = chunk_text(words, CHUNK_SIZE, OVERLAP)
+# All documents are tokenized together in one parallel batch
+all_chunks = []
 
-    for chunk in text_chunks:
+for doc_chunks in chunk_documents(documents, max_tokens=MAX_CHUNK_TOKENS):
+    for chunk in doc_chunks:
         all_chunks.append({
             "id": str(uuid.uuid4()),
             "source": "scikit-learn",
             "topic": "classification",
             "difficulty": "competent",
-            "content": chunk
+            "heading": chunk["heading"],
+            "content": chunk["text"]
         })
 
 print("Total chunks created:", len(all_chunks))
 
+# Page chrome repeated across the HTML pages and copied passages: keep one chunk per
+# near-duplicate cluster ("duplicates" lists the ids it replaces)
+if DEDUP_ENABLED:
+    all_chunks, _ = dedup_chunks(all_chunks, text_key="content")
+
 with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
     json.dump(all_chunks, f, indent=2)
 
@@ -0,0 +1,211 @@
+import os
+import time
+import random
+import threading
+
+from llm_provider import LLMError, LLMTimeoutError, get_provider
+from metrics import span, inc, record_llm_call
+
+# --------------------------------------------------
+# SHARED LLM CLIENT CONFIGURATION
+# --------------------------------------------------
+# Sized for the Gemini free tier by default; raise with a paid quota.
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "2"))   # sustained requests/sec
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))                         # token bucket capacity
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))       # calls in flight per process
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))    # hard deadline incl. retries
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))         # seconds
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+
+class LLMUnavailableError(LLMError):
+    """The client refused to call the provider (circuit open, rate limit or deadline exhausted)."""
+
+
+# --------------------------------------------------
+# TOKEN BUCKET
+# --------------------------------------------------
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float) -> bool:
+        """Takes one token, waiting up to `timeout` seconds for a refill."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+# --------------------------------------------------
+# CIRCUIT BREAKER
+# --------------------------------------------------
+class CircuitBreaker:
+    """
+    closed    → calls flow; `failure_threshold` consecutive failures open the circuit.
+    open      → calls fail fast for `reset_seconds`.
+    half_open → one probe call is let through; success closes, failure re-opens.
+                A probe that never reached the provider gives its turn back (release);
+                one that never reports back expires after `reset_seconds`.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if self.state == "open" and now - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self.probe_started_at = now
+                return True
+            if self.state == "half_open" and now - self.probe_started_at >= self.reset_seconds:
+                self.probe_started_at = now   # the last probe was lost: let another one through
+                return True
+            return False
+
+    def release(self):
+        """The allowed call never reached the provider (no outcome): a half-open probe slot is freed."""
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+                self.opened_at = time.monotonic() - self.reset_seconds   # the next call probes at once
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    inc("llm_circuit_trips_total")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+# --------------------------------------------------
+# CLIENT
+# --------------------------------------------------
+class LLMClient:
+    """
+    The one way the tutor talks to an LLM. Wraps the configured provider with a
+    token-bucket rate limiter, a concurrency cap, jittered exponential backoff,
+    a circuit breaker and a hard per-call deadline. Errors are raised as
+    LLMError subclasses, never returned as strings.
+    """
+
+    def __init__(self, provider=None, rate: float = LLM_RATE_PER_SECOND, burst: int = LLM_BURST,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, timeout: float = LLM_TIMEOUT_SECONDS,
+                 max_retries: int = LLM_MAX_RETRIES):
+        self._provider = provider
+        self.bucket = TokenBucket(rate, burst)
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    @property
+    def provider(self):
+        # Resolved per call so llm_provider.set_provider() takes effect immediately
+        return self._provider or get_provider()
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": uniform in [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+    def generate(self, prompt: str, temperature: float | None = None, model: str | None = None,
+                 timeout: float | None = None) -> str:
+        provider = self.provider
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                inc("llm_requests_total", provider=provider.name, outcome="circuit_open")
+                raise LLMUnavailableError("LLM circuit breaker is open; failing fast.")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.bucket.acquire(remaining):
+                self.breaker.release()
+                inc("llm_requests_total", provider=provider.name, outcome="rate_limited")
+                raise LLMUnavailableError("LLM rate limit: no capacity before the deadline.")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.slots.acquire(timeout=remaining):
+                self.breaker.release()
+                inc("llm_requests_total", provider=provider.name, outcome="saturated")
+                raise LLMUnavailableError("LLM concurrency limit: no free slot before the deadline.")
+
+            try:
+                with span("llm"):
+                    text = provider.generate(prompt, temperature=temperature,
+                                             timeout=deadline - time.monotonic(), model=model)
+                self.breaker.record_success()
+                record_llm_call(provider.name, prompt, text)
+                return text
+            except LLMError as e:
+                last_error = e
+                record_llm_call(provider.name, prompt, None,
+                                outcome="timeout" if isinstance(e, LLMTimeoutError) else "error")
+                # Every provider error counts, retryable or not: a half-open probe must always report
+                self.breaker.record_failure()
+                if not e.retryable:
+                    raise
+            except Exception as e:
+                # Unknown provider failure: count it against the breaker but do not retry
+                self.breaker.record_failure()
+                record_llm_call(provider.name, prompt, None, outcome="error")
+                raise LLMError(f"LLM call failed: {e}") from e
+            finally:
+                self.slots.release()
+
+            pause = self._backoff(attempt)
+            if attempt == self.max_retries or time.monotonic() + pause >= deadline:
+                break
+            inc("llm_retries_total")
+            time.sleep(pause)
+
+        if isinstance(last_error, LLMTimeoutError):
+            raise last_error
+        raise LLMUnavailableError(f"LLM call failed after retries: {last_error}")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> LLMClient:
+    """Process-wide client shared by gemini_explainer and RAGGenerator."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient()
+    return _client
@@ -0,0 +1,174 @@
+import os
+import time
+import random
+import hashlib
+import threading
+import httpx
+
+# --------------------------------------------------
+# PROVIDER SELECTION
+# --------------------------------------------------
+# LLM_PROVIDER=gemini (default) talks to Google Gemini and needs GEMINI_API_KEY.
+# LLM_PROVIDER=stub  is a local, deterministic fake for offline runs and load tests.
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
+GEMINI_MODEL = "models/gemini-2.5-flash"
+
+# Stub tuning (all optional)
+STUB_LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS", "800"))       # median latency
+STUB_LATENCY_SIGMA = float(os.getenv("STUB_LLM_LATENCY_SIGMA", "0.35"))  # log-normal spread
+STUB_TOKENS = int(os.getenv("STUB_LLM_TOKENS", "250"))                 # mean output tokens
+STUB_TOKENS_SIGMA = int(os.getenv("STUB_LLM_TOKENS_SIGMA", "60"))
+
+
+class LLMError(Exception):
+    """Raised by providers and the client. `retryable` marks transient failures."""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class LLMTimeoutError(LLMError):
+    def __init__(self, message: str = "LLM call timed out"):
+        super().__init__(message, retryable=True)
+
+
+class LLMProvider:
+    """Minimal interface every LLM backend implements: prompt in, text out."""
+
+    name = "base"
+
+    def generate(self, prompt: str, temperature: float | None = None,
+                 timeout: float | None = None, model: str | None = None) -> str:
+        raise NotImplementedError
+
+
+class GeminiProvider(LLMProvider):
+    """
+    Gemini over its REST API on one pooled, keep-alive HTTP client.
+    Resilience (rate limiting, retries, circuit breaking) lives in llm_client.LLMClient.
+    """
+
+    name = "gemini"
+    BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+    def __init__(self, model_name: str = GEMINI_MODEL, max_connections: int = 20):
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise RuntimeError(
+                "GEMINI_API_KEY not set.\n"
+                "Run this once in PowerShell:\n"
+                "setx GEMINI_API_KEY \"your_api_key_here\"\n"
+                "or set LLM_PROVIDER=stub to run offline."
+            )
+
+        self.model_name = model_name
+        self.client = httpx.Client(
+            base_url=self.BASE_URL,
+            headers={"x-goog-api-key": api_key},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(30.0, connect=5.0),
+        )
+
+    def generate(self, prompt: str, temperature: float | None = None,
+                 timeout: float | None = None, model: str | None = None) -> str:
+        model = model or self.model_name
+        if not model.startswith("models/"):
+            model = f"models/{model}"
+
+        body = {"contents": [{"parts": [{"text": prompt}]}]}
+        if temperature is not None:
+            body["generationConfig"] = {"temperature": temperature}
+
+        try:
+            response = self.client.post(f"/{model}:generateContent", json=body,
+                                        timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT)
+        except httpx.TimeoutException as e:
+            raise LLMTimeoutError(f"Gemini request timed out: {e}") from e
+        except httpx.TransportError as e:
+            raise LLMError(f"Gemini connection error: {e}", retryable=True) from e
+
+        if response.status_code != 200:
+            retryable = response.status_code == 429 or response.status_code >= 500
+            raise LLMError(f"Gemini returned HTTP {response.status_code}: {response.text[:200]}", retryable=retryable)
+
+        try:
+            parts = response.json()["candidates"][0]["content"]["parts"]
+        except (KeyError, IndexError, ValueError) as e:
+            raise LLMError(f"Unexpected Gemini response: {response.text[:200]}") from e
+        return "".join(part.get("text", "") for part in parts)
+
+
+class StubProvider(LLMProvider):
+    """
+    Offline stand-in for Gemini, in the spirit of member1's simulated_llm.
+    Latency is drawn from a log-normal distribution around latency_ms and the
+    output length from a normal distribution around tokens. The text itself is
+    deterministic per prompt and follows the EXPLANATION / CHECKPOINT QUESTION
+    format that gemini_explainer parses.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency_ms: float = STUB_LATENCY_MS, latency_sigma: float = STUB_LATENCY_SIGMA,
+                 tokens: int = STUB_TOKENS, tokens_sigma: int = STUB_TOKENS_SIGMA, seed: int | None = None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens = tokens
+        self.tokens_sigma = tokens_sigma
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _sample(self) -> tuple[float, int]:
+        with self._lock:
+            latency = self._rng.lognormvariate(0.0, self.latency_sigma) * self.latency_ms if self.latency_ms > 0 else 0.0
+            tokens = max(10, int(self._rng.gauss(self.tokens, self.tokens_sigma)))
+        return latency / 1000.0, tokens
+
+    def generate(self, prompt: str, temperature: float | None = None,
+                 timeout: float | None = None, model: str | None = None) -> str:
+        latency, tokens = self._sample()
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise LLMTimeoutError(f"Stub LLM exceeded {timeout:.2f}s")
+        if latency:
+            time.sleep(latency)
+
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        words = [w for w in prompt.split() if w.isalpha()] or ["concept"]
+        body = " ".join(words[i % len(words)] for i in range(tokens))
+
+        return (
+            "EXPLANATION:\n"
+            f"[stub {digest}] {body}\n\n"
+            "CHECKPOINT QUESTION:\n"
+            "In your own words, what is the key idea behind this concept?"
+        )
+
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "stub": StubProvider,
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> LLMProvider:
+    """Returns the process-wide provider selected by LLM_PROVIDER."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if LLM_PROVIDER not in PROVIDERS:
+                    raise ValueError(f"Unknown LLM_PROVIDER '{LLM_PROVIDER}'. Choose one of: {', '.join(PROVIDERS)}")
+                _provider = PROVIDERS[LLM_PROVIDER]()
+    return _provider
+
+
+def set_provider(provider: LLMProvider):
+    """Overrides the process-wide provider (load tests, replay tools)."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
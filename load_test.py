@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import numpy as np
+import httpx
+
+# --- Configuration ---
+DEFAULT_CONCURRENCY = "1,2,4,8,16"
+SESSIONS_PER_LEVEL = 32
+ANSWER_TURNS = 3          # concept answers per session after onboarding
+TIMEOUT_SECONDS = 60
+
+SAMPLE_ANSWERS = [
+    "I don't know",
+    "It measures how the output changes when the input changes.",
+    "We compute the gradient and move in the opposite direction to minimise the loss.",
+    "A matrix is invertible when its determinant is non-zero, and the rank tells us how many columns are independent.",
+]
+
+
+# --- Session Scripts ---
+def build_tutor_session(rng: random.Random) -> list[tuple[str, dict]]:
+    """
+    One learner on /api/tutor: start → five onboarding answers → topic selection → concept answers.
+    Each step is (stage, request body).
+    """
+    from member3.initial_assessment import get_initial_questions
+
+    with open("expert_knowledge.json", encoding="utf-8") as f:
+        subtopics = [c["subtopic"] for c in json.load(f)]
+
+    steps = [("start", {"answer": None})]
+    for q in get_initial_questions():
+        steps.append(("onboarding", {"answer": rng.choice(q["options"])}))
+    steps.append(("topic_selection", {"answer": rng.choice(subtopics)}))
+    for _ in range(ANSWER_TURNS):
+        steps.append(("answer", {"answer": rng.choice(SAMPLE_ANSWERS)}))
+    return steps
+
+
+def build_ask_session(rng: random.Random) -> list[tuple[str, dict]]:
+    """One learner on /ask: greeting → self-assessed score → topic → concept answers."""
+    topics = ["Linear Regression", "Bias-Variance Tradeoff", "Gradient Descent", "Singular Value Decomposition"]
+    steps = [
+        ("start", {"query": "I want to start learning"}),
+        ("onboarding", {"query": str(rng.randint(0, 100))}),
+        ("topic_selection", {"query": rng.choice(topics)}),
+    ]
+    for _ in range(ANSWER_TURNS):
+        steps.append(("answer", {"query": rng.choice(SAMPLE_ANSWERS)}))
+    return steps
+
+
+TARGETS = {
+    "tutor": {"path": "/api/tutor", "reset": "/api/reset", "session": build_tutor_session},
+    "ask": {"path": "/ask", "reset": None, "session": build_ask_session},
+}
+
+
+def load_app(target: str):
+    """Imports the FastAPI app in-process (the stub LLM must be selected before this)."""
+    if target == "tutor":
+        import api
+        return api.app
+
+    import main_app
+    if not main_app.rag_retriever_is_ready:
+        main_app.load_rag_components()
+    return main_app.app
+
+
+# --- Load Generation ---
+async def run_session(client, path, steps, think_seconds, records):
+    for stage, body in steps:
+        start = time.perf_counter()
+        try:
+            response = await client.post(path, json=body)
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        records.append((stage, time.perf_counter() - start, ok))
+        if think_seconds:
+            await asyncio.sleep(think_seconds)
+
+
+async def run_level(client, target_cfg, concurrency, sessions, think_seconds, seed):
+    rng = random.Random(seed)
+    scripts = [target_cfg["session"](rng) for _ in range(sessions)]
+    records = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    if target_cfg["reset"]:
+        await client.post(target_cfg["reset"])
+
+    async def worker(steps):
+        async with semaphore:
+            await run_session(client, target_cfg["path"], steps, think_seconds, records)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(steps) for steps in scripts))
+    return records, time.perf_counter() - start
+
+
+def summarize(records, elapsed):
+    def stats(latencies):
+        ms = np.array(latencies) * 1000
+        return {
+            "n": len(ms),
+            "p50_ms": round(float(np.percentile(ms, 50)), 1),
+            "p95_ms": round(float(np.percentile(ms, 95)), 1),
+            "p99_ms": round(float(np.percentile(ms, 99)), 1),
+        }
+
+    summary = {
+        "requests": len(records),
+        "errors": sum(1 for _, _, ok in records if not ok),
+        "rps": round(len(records) / elapsed, 2),
+        "latency": stats([lat for _, lat, _ in records]),
+        "stages": {},
+    }
+    for stage in dict.fromkeys(stage for stage, _, _ in records):
+        summary["stages"][stage] = stats([lat for s, lat, _ in records if s == stage])
+    return summary
+
+
+async def main_async(args):
+    target_cfg = TARGETS[args.target]
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    if args.url:
+        transport, base_url = None, args.url
+    else:
+        transport, base_url = httpx.ASGITransport(app=load_app(args.target)), "http://loadtest"
+
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=TIMEOUT_SECONDS) as client:
+        for level in levels:
+            records, elapsed = await run_level(client, target_cfg, level, args.sessions, args.think_ms / 1000, args.seed)
+            summary = {"concurrency": level, **summarize(records, elapsed)}
+            results.append(summary)
+
+            lat = summary["latency"]
+            print(f"c={level:<4} rps={summary['rps']:<8} p50={lat['p50_ms']}ms p95={lat['p95_ms']}ms "
+                  f"p99={lat['p99_ms']}ms errors={summary['errors']}")
+            for stage, s in summary["stages"].items():
+                print(f"       {stage:<16} p50={s['p50_ms']}ms p95={s['p95_ms']}ms (n={s['n']})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay multi-turn learner sessions against the tutor APIs.")
+    parser.add_argument("--target", choices=TARGETS, default="tutor", help="tutor = api.py /api/tutor, ask = main_app.py /ask")
+    parser.add_argument("--url", help="Base URL of a running server. Omit to run the app in-process with the stub LLM.")
+    parser.add_argument("--concurrency", default=DEFAULT_CONCURRENCY, help="Comma-separated concurrency levels.")
+    parser.add_argument("--sessions", type=int, default=SESSIONS_PER_LEVEL, help="Learner sessions per level.")
+    parser.add_argument("--think-ms", type=float, default=0, help="Pause between turns of one learner.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Optional JSON results file.")
+    args = parser.parse_args()
+
+    if not args.url:
+        # In-process runs never touch the network. The stub has no provider quota,
+        # so lift the client's rate limit unless the caller wants to test it.
+        os.environ.setdefault("LLM_PROVIDER", "stub")
+        os.environ.setdefault("LLM_RATE_PER_SECOND", "10000")
+        os.environ.setdefault("LLM_BURST", "10000")
+        # Synthetic learners must not reach event_log/: the next server start would restore them
+        os.environ["EVENT_LOG_ENABLED"] = "0"
+
+    print("NOTE: the tutor backend keeps a single global learner, so concurrent sessions share state.\n"
+          "      The numbers measure the request path under load, not per-learner correctness.\n")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,24 @@
+# Thread budget first: the OpenMP/BLAS pools size themselves when torch/faiss/numpy load
+from runtime_config import configure_runtime
+configure_runtime()
+
 import uvicorn
 import time
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from fastapi import FastAPI, Depends, HTTPException, Request 
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import Annotated
 import os # Ensure os is imported for API key handling
+import metrics
 
 # Import the core RAG components
 try:
     from retriever import RAGRetriever
     from generator import RAGGenerator, UserProfile
+    from llm_provider import LLMError
+    from relevance_gate import OFF_TOPIC_ANSWER, is_relevant
 except ImportError as e:
     print(f"CRITICAL ERROR: Failed to import core RAG components. Ensure retriever.py and generator.py are in the same folder.")
     print(f"Details: {e}")
@@ -23,10 +31,16 @@ app = FastAPI(
     description="A Retrieval-Augmented Generation API for the Machine Learning Curriculum.",
 )
 
+# Per-stage timings and counters, exposed at GET /metrics
+metrics.instrument_app(app)
+
 # Initialize Jinja2Templates for HTML rendering
 # Assuming you have a 'templates' folder with 'chat_ui.html'
 templates = Jinja2Templates(directory="templates") 
 
+# "single" = RAGRetriever over faiss_index.bin; "sharded" = one index per corpus (sharded_retriever.py)
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "single")
+
 # --- GLOBAL STATE MANAGEMENT (for the interactive dialogue) ---
 USER_ID = "fastapi_user" # Hardcoded ID for single-user session
 USER_STATE = {
@@ -63,7 +77,11 @@ def load_rag_components():
     try:
         print("--- RAG Retriever: Loading Components ---")
         # Initialize RAG components
-        rag_retriever = RAGRetriever()
+        if RETRIEVER_BACKEND == "sharded":
+            from sharded_retriever import ShardedRetriever  # imports faiss/torch: only when selected
+            rag_retriever = ShardedRetriever()
+        else:
+            rag_retriever = RAGRetriever()
         rag_generator = RAGGenerator()
         
         if not rag_retriever.is_ready:
@@ -178,24 +196,43 @@ async def ask_adaptive_question(
 
     # 2. Retrieval Step 
     topic_for_search = current_state["current_topic"]
-    context_chunks = retriever.retrieve_context(topic_for_search, k=4)
+    if hasattr(retriever, "retrieve_scored"):
+        hits, version = retriever.retrieve_scored(topic_for_search, k=4)
+        context_chunks = [text for _, text in hits]
+        relevant = is_relevant(topic_for_search, [distance for distance, _ in hits], version)
+    else:
+        # Sharded scores are per-shard z-scores, not the L2 distances the gate is calibrated on
+        context_chunks = retriever.retrieve_context(topic_for_search, k=4)
+        relevant = True
     
     if not context_chunks:
         current_state["last_question"] = "topic_selection"
         USER_STATE[user_id] = current_state
         return ResponseOutput(answer=f"I couldn't find relevant curriculum information on '{topic_for_search}'. Please choose a core ML concept from the curriculum.")
 
+    # Clearly off-curriculum: the canned answer instead of an LLM call the prompt would make refuse anyway
+    if not relevant:
+        current_state["last_question"] = "topic_selection"
+        USER_STATE[user_id] = current_state
+        return ResponseOutput(answer=OFF_TOPIC_ANSWER)
+
     # 3. Generation Step (The LLM is now instructed to EXPLAIN AND ASK)
     
     # Prepend feedback if this is a follow-up answer
     prefix = f"{feedback}\n\n" if current_state.get("last_question") == "ready_for_next_question" else ""
     
     # We pass the topic to the generator, which is instructed to explain it, then ask a question.
-    final_response_with_question = generator.generate_response(
-        f"Provide an adaptive explanation and ask a question about: {user_profile.current_topic}", 
-        context_chunks, 
-        user_profile
-    )
+    # The LLM call blocks, so it runs in the threadpool instead of stalling the event loop.
+    try:
+        final_response_with_question = await run_in_threadpool(
+            generator.generate_response,
+            f"Provide an adaptive explanation and ask a question about: {user_profile.current_topic}", 
+            context_chunks, 
+            user_profile
+        )
+    except LLMError as e:
+        print(f"LLM unavailable: {e}")
+        raise HTTPException(status_code=503, detail="The tutor's language model is temporarily unavailable. Please try again shortly.")
     
     # 4. Update state to expect an answer
     current_state["last_question"] = "concept_question"
@@ -2,29 +2,26 @@
 
 import json
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from bulk_embedder import embed_corpus
 
-# 1. Load chunks.json
-with open("chunks.json", "r") as f:
-    chunks = json.load(f)
+# (guarded: bulk_embedder's spawn-started workers re-import this module)
+if __name__ == "__main__":
+    # 1. Load chunks.json
+    with open("chunks.json", "r") as f:
+        chunks = json.load(f)
 
-print("Chunks loaded:", len(chunks))
+    print("Chunks loaded:", len(chunks))
 
-# 2. Extract text content only
-texts = [chunk["content"] for chunk in chunks]
+    # 2. Extract text content only
+    texts = [chunk["content"] for chunk in chunks]
 
-print("Texts extracted:", len(texts))
+    print("Texts extracted:", len(texts))
 
-# 3. Load embedding model
-print("Loading embedding model...")
-model = SentenceTransformer("all-MiniLM-L6-v2")
-print("Model loaded successfully.")
+    # 3-4. Generate embeddings (length-bucketed batches over a process pool, written to embeddings.npy)
+    print("Generating embeddings...")
+    embeddings = embed_corpus(texts, "embeddings.npy", "all-MiniLM-L6-v2")
 
-# 4. Generate embeddings
-print("Generating embeddings...")
-embeddings = model.encode(texts, convert_to_numpy=True)
-
-# 5. Verify embeddings
-print("Embeddings generated.")
-print("Embedding shape:", embeddings.shape)
-print("Embedding type:", type(embeddings))
+    # 5. Verify embeddings
+    print("Embeddings generated.")
+    print("Embedding shape:", embeddings.shape)
+    print("Embedding type:", type(embeddings))
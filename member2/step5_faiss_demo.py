@@ -1,46 +1,99 @@
 import json
-import faiss
 import numpy as np
 import os
-from sentence_transformers import SentenceTransformer
+from metrics import span
+from knowledge_store import VersionedRef, content_version, load_knowledge, watch
+from retrieval_sidecar import RETRIEVAL_MODE, CORPUS_CURRICULUM, SidecarError, get_sidecar_client
+from topic_neighbors import lookup_neighbors
+from runtime_config import apply_thread_budget
 
 # Resolve dataset path
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 DATASET_PATH = os.path.join(BASE_DIR, "expert_knowledge.json")
 
-# Load dataset
-with open(DATASET_PATH, encoding="utf-8") as f:
-    chunks = json.load(f)
+if RETRIEVAL_MODE != "sidecar":
+    import faiss
+    from sentence_transformers import SentenceTransformer
 
-# Load embedding model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+    # Load embedding model
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    apply_thread_budget()
 
-# Extract explanations only
-texts = [chunk["explanation"] for chunk in chunks]
 
-# Generate embeddings
-embeddings = model.encode(texts, convert_to_numpy=True)
-faiss.normalize_L2(embeddings)
+def build_index(paths):
+    """Loads the dataset, embeds the explanations and builds the FAISS index: (chunks, index)."""
+    with open(paths[0], encoding="utf-8") as f:
+        chunks = json.load(f)
 
-# Build FAISS index
-dimension = embeddings.shape[1]
-index = faiss.IndexFlatIP(dimension)
-index.add(embeddings)
+    # Extract explanations only
+    texts = [chunk["explanation"] for chunk in chunks]
+
+    # Generate embeddings
+    embeddings = model.encode(texts, convert_to_numpy=True)
+    faiss.normalize_L2(embeddings)
+
+    # Build FAISS index
+    dimension = embeddings.shape[1]
+    index = faiss.IndexFlatIP(dimension)
+    index.add(embeddings)
+
+    print(f"[FAISS] Index built with {index.ntotal} chunks")
+    return chunks, index
+
+
+if RETRIEVAL_MODE == "sidecar":
+    # Thin client: the retrieval sidecar embeds and searches; only the curriculum is
+    # kept here, to turn the chunk ids it returns back into chunks.
+    knowledge = VersionedRef(load_knowledge([DATASET_PATH]), content_version([DATASET_PATH]))
+    watch("step5_curriculum", [DATASET_PATH], load_knowledge, knowledge)
+else:
+    # (chunks, index) behind a versioned reference: when expert_knowledge.json changes,
+    # a watcher re-embeds and rebuilds in the background and swaps the pair atomically.
+    knowledge = VersionedRef(build_index([DATASET_PATH]), content_version([DATASET_PATH]))
+    chunks, index = knowledge.get()  # version loaded at import (used by benchmark_retrieval.py)
+    watch("step5_faiss_index", [DATASET_PATH], build_index, knowledge)
+
+# Ranked search (also used by benchmark_retrieval.py)
+def search_chunks(query, top_k=5):
+    """Returns the top_k (chunk, cosine score) pairs for a query, best first."""
+    if RETRIEVAL_MODE == "sidecar":
+        kb, version = knowledge.get_versioned()
+        known = lookup_neighbors("curriculum", query, top_k, version)
+        if known is not None:
+            return [(kb.chunks[idx], score) for idx, score in known if idx < len(kb.chunks)]
+        try:
+            hits = get_sidecar_client().search(CORPUS_CURRICULUM, query, top_k)
+        except SidecarError as e:
+            print(f"Retrieval sidecar error: {e}")
+            return []
+        return [(kb.by_id[chunk_id], score) for score, chunk_id in hits if chunk_id in kb.by_id]
+
+    (chunks, index), version = knowledge.get_versioned()  # one version for the whole search
+
+    # Subtopic/topic names have precomputed neighbors: no embedding
+    known = lookup_neighbors("curriculum", query, top_k, version)
+    if known is not None:
+        return [(chunks[idx], score) for idx, score in known if idx < len(chunks)]
+
+    with span("embed"):
+        query_embedding = model.encode([query], convert_to_numpy=True)
+        faiss.normalize_L2(query_embedding)
+
+    with span("faiss_search"):
+        scores, indices = index.search(query_embedding, top_k)
+
+    return [(chunks[idx], float(score)) for idx, score in zip(indices[0], scores[0]) if idx >= 0]
 
-print(f"[FAISS] Index built with {index.ntotal} chunks")
 
 # Retrieval function
 def retrieve_context_by_difficulty(query, difficulty=None, top_k=5):
-    query_embedding = model.encode([query], convert_to_numpy=True)
-    faiss.normalize_L2(query_embedding)
-
-    scores, indices = index.search(query_embedding, top_k)
+    results = search_chunks(query, top_k)
 
-    for idx in indices[0]:
-        if difficulty is None or chunks[idx]["difficulty"] == difficulty:
-            return chunks[idx]
+    for chunk, _ in results:
+        if difficulty is None or chunk["difficulty"] == difficulty:
+            return chunk
 
-    return chunks[indices[0][0]]
+    return results[0][0] if results else None
 
 
 # Standalone test
@@ -51,6 +104,9 @@ if __name__ == "__main__":
     )
 
     print("\n[TEST RETRIEVAL]")
-    print("ID:", test["id"])
-    print("Topic:", test["topic"])
-    print("Explanation:", test["explanation"][:200], "...")
+    if test is None:
+        print("No chunk retrieved.")
+    else:
+        print("ID:", test["id"])
+        print("Topic:", test["topic"])
+        print("Explanation:", test["explanation"][:200], "...")
@@ -1,59 +1,66 @@
 # member3/initial_assessment.py
 
+INITIAL_QUESTIONS = [
+    {
+        "id": "q1_self_level",
+        "question": "Which best describes you?",
+        "options": [
+            "New to machine learning",
+            "Know basic ML concepts",
+            "Have trained ML models",
+            "Have deployed or researched ML models"
+        ]
+    },
+    {
+        "id": "q2_concept_check",
+        "question": "Which task is supervised learning best suited for?",
+        "options": [
+            "Grouping news articles by similarity",
+            "Predicting house prices from past sales",
+            "Detecting anomalies in network traffic",
+            "Reducing dimensionality"
+        ],
+        "correct": "Predicting house prices from past sales"
+    },
+    {
+        "id": "q3_math_level",
+        "question": "How comfortable are you with the following? (Select highest)",
+        "options": [
+            "None of the above",
+            "Probability & statistics",
+            "Linear algebra",
+            "Calculus (gradients)"
+        ]
+    },
+    {
+        "id": "q4_practical",
+        "question": "Have you ever trained a model yourself?",
+        "options": [
+            "No",
+            "Yes, using ML libraries",
+            "Yes, including tuning and evaluation"
+        ]
+    },
+    {
+        "id": "q5_intent",
+        "question": "What do you want to use this ML tutor for?",
+        "options": [
+            "Learning from scratch",
+            "Interview prep",
+            "Project help",
+            "Research / advanced topics",
+            "Production / deployment"
+        ]
+    }
+]
+
+# Built once; the onboarding endpoints and every /api/tutor step read the same list
+QUESTION_IDS = [q["id"] for q in INITIAL_QUESTIONS]
+QUESTIONS_BY_ID = {q["id"]: q for q in INITIAL_QUESTIONS}
+
+
 def get_initial_questions():
-    return [
-        {
-            "id": "q1_self_level",
-            "question": "Which best describes you?",
-            "options": [
-                "New to machine learning",
-                "Know basic ML concepts",
-                "Have trained ML models",
-                "Have deployed or researched ML models"
-            ]
-        },
-        {
-            "id": "q2_concept_check",
-            "question": "Which task is supervised learning best suited for?",
-            "options": [
-                "Grouping news articles by similarity",
-                "Predicting house prices from past sales",
-                "Detecting anomalies in network traffic",
-                "Reducing dimensionality"
-            ],
-            "correct": "Predicting house prices from past sales"
-        },
-        {
-            "id": "q3_math_level",
-            "question": "How comfortable are you with the following? (Select highest)",
-            "options": [
-                "None of the above",
-                "Probability & statistics",
-                "Linear algebra",
-                "Calculus (gradients)"
-            ]
-        },
-        {
-            "id": "q4_practical",
-            "question": "Have you ever trained a model yourself?",
-            "options": [
-                "No",
-                "Yes, using ML libraries",
-                "Yes, including tuning and evaluation"
-            ]
-        },
-        {
-            "id": "q5_intent",
-            "question": "What do you want to use this ML tutor for?",
-            "options": [
-                "Learning from scratch",
-                "Interview prep",
-                "Project help",
-                "Research / advanced topics",
-                "Production / deployment"
-            ]
-        }
-    ]
+    return INITIAL_QUESTIONS
 
 
 def get_next_question(current_answers):
@@ -61,12 +68,23 @@ def get_next_question(current_answers):
     Returns the next question object that hasn't been answered yet.
     Returns None if all are answered.
     """
-    questions = get_initial_questions()
-    for q in questions:
+    for q in INITIAL_QUESTIONS:
         if q["id"] not in current_answers:
             return q
     return None
 
+
+def validate_answers(answers):
+    """Problems with a complete answer set ({question id: chosen option}); empty when valid."""
+    problems = []
+    for qid in QUESTION_IDS:
+        if qid not in answers:
+            problems.append(f"missing answer for {qid}")
+        elif answers[qid] not in QUESTIONS_BY_ID[qid]["options"]:
+            problems.append(f"{qid}: {answers[qid]!r} is not one of the options")
+    problems.extend(f"unknown question {qid}" for qid in answers if qid not in QUESTIONS_BY_ID)
+    return problems
+
 def collect_answers(simulated_answers=None):
     """
     Legacy support for CLI testing if needed, or strictly deprecated.
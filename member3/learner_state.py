@@ -0,0 +1,210 @@
+# member3/learner_state.py
+
+import time
+import numpy as np
+
+# --------------------------------------------------
+# COLUMNAR LEARNER STATE (LEARNERS x SUBTOPICS)
+# --------------------------------------------------
+# One float64 matrix holds every learner's mastery per subtopic, so a batch
+# of evaluation events is a handful of vectorized NumPy operations instead of
+# one dict update per event. The per-request path (score_update.update_score,
+# backend_controller.get_tier) uses the same kernels, so a learner replayed
+# here ends with exactly the scores the live tutor produced.
+
+# EMA smoothing of update_score: new = DECAY * old + WEIGHT * eval
+SCORE_DECAY = 0.7
+EVAL_WEIGHT = 0.3
+SCORE_DECIMALS = 3
+INITIAL_SCORE = 0.3
+
+# backend_controller.get_tier: < 0.4 foundational, < 0.75 competent, else expert
+SUBTOPIC_TIERS = np.array(["foundational", "competent", "expert"])
+SUBTOPIC_TIER_BOUNDS = np.array([0.4, 0.75])
+
+# learner_model.LearnerProfile.calculate_tier on the 0–100 dimension average:
+# < 40 foundational, <= 80 competent, else mastery
+PROFILE_TIERS = np.array(["foundational", "competent", "mastery"])
+
+
+def ema(old, eval_score):
+    """
+    Smoothed score update; works on scalars and arrays alike and matches
+    round(0.7 * old + 0.3 * eval, 3) bit for bit.
+    """
+    value = SCORE_DECAY * np.asarray(old, dtype=np.float64) + EVAL_WEIGHT * np.asarray(eval_score, dtype=np.float64)
+    rounded = np.array(np.round(value, SCORE_DECIMALS))   # writable, also for scalars
+    # np.round rounds value * 10**d, which is itself rounded; Python's round() uses the
+    # exact value. They can only disagree next to a rounding midpoint (e.g. 0.0945),
+    # so those few elements are redone with round().
+    scaled = value * 10.0 ** SCORE_DECIMALS
+    near_midpoint = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_midpoint.any():
+        rounded[near_midpoint] = [round(float(v), SCORE_DECIMALS) for v in value[near_midpoint]]
+    return rounded[()]   # numpy scalar for scalar input, as np.round returns
+
+
+def tier_index(scores):
+    """0 = foundational, 1 = competent, 2 = expert (vectorized get_tier)."""
+    scores = np.asarray(scores)
+    index = np.zeros(scores.shape, dtype=np.int64)
+    for bound in SUBTOPIC_TIER_BOUNDS:   # two comparisons beat np.digitize's binary search
+        index += scores >= bound
+    return index
+
+
+def get_tier(score: float) -> str:
+    return str(SUBTOPIC_TIERS[tier_index(score)])
+
+
+def profile_tiers(dimension_scores) -> np.ndarray:
+    """Vectorized LearnerProfile.calculate_tier for an (n_learners, n_dimensions) 0–100 matrix."""
+    avg = np.asarray(dimension_scores, dtype=np.float64).mean(axis=-1)
+    return PROFILE_TIERS[(avg >= 40).astype(np.int8) + (avg > 80)]
+
+
+class LearnerState:
+    """
+    Mastery of many learners over a fixed list of subtopics.
+    Rows are learners (grown by doubling), columns follow the order of `subtopics`,
+    which should be the KNOWLEDGE order so argmin ties match get_weakest_topic.
+    """
+
+    def __init__(self, subtopics: list[str], initial_score: float = INITIAL_SCORE, capacity: int = 1024):
+        self.subtopics = list(subtopics)
+        self.column = {s: i for i, s in enumerate(self.subtopics)}
+        self.initial_score = initial_score
+        self.learner_ids = []
+        self.row = {}
+        self._scores = np.full((capacity, len(self.subtopics)), initial_score, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.learner_ids)
+
+    @property
+    def scores(self) -> np.ndarray:
+        """(n_learners, n_subtopics) view of the live rows."""
+        return self._scores[:len(self.learner_ids)]
+
+    # --- learners ---
+    def add_learners(self, learner_ids) -> np.ndarray:
+        """Adds unknown ids at the initial score; returns the row of every id."""
+        new = [lid for lid in dict.fromkeys(learner_ids) if lid not in self.row]
+        if new:
+            needed = len(self.learner_ids) + len(new)
+            if needed > len(self._scores):
+                capacity = max(needed, 2 * len(self._scores))
+                grown = np.full((capacity, len(self.subtopics)), self.initial_score, dtype=np.float64)
+                grown[:len(self.learner_ids)] = self.scores
+                self._scores = grown
+            for lid in new:
+                self.row[lid] = len(self.learner_ids)
+                self.learner_ids.append(lid)
+        return np.fromiter((self.row[lid] for lid in learner_ids), dtype=np.int64, count=len(learner_ids))
+
+    def get_scores(self, learner_id) -> dict:
+        """One learner as the {subtopic: score} dict the backend uses."""
+        row = self.scores[self.row[learner_id]]
+        return {s: float(row[i]) for i, s in enumerate(self.subtopics)}
+
+    def set_scores(self, learner_id, scores: dict):
+        row = self.add_learners([learner_id])[0]
+        for subtopic, score in scores.items():
+            self._scores[row, self.column[subtopic]] = score
+
+    def columns_for(self, subtopics) -> np.ndarray:
+        """Column index per event; integer input is taken as column indices already."""
+        subtopics = np.asarray(subtopics)
+        if subtopics.dtype.kind in "iu":
+            return subtopics.astype(np.int64, copy=False)
+        unique_topics, inverse = np.unique(subtopics, return_inverse=True)
+        return np.array([self.column[s] for s in unique_topics.tolist()], dtype=np.int64)[inverse]
+
+    # --- events ---
+    def apply_events(self, learner_ids, subtopics, eval_scores):
+        """
+        Applies a batch of (learner, subtopic, eval score) events in order.
+        `subtopics` may be names or column indices (faster for large batches).
+        Repeated (learner, subtopic) pairs are applied in successive rounds, so the
+        result equals calling update_score once per event.
+        """
+        evals = np.asarray(eval_scores, dtype=np.float64)
+        if len(evals) == 0:
+            return
+        # Resolve each distinct id / subtopic once instead of once per event
+        unique_ids, id_inverse = np.unique(np.asarray(learner_ids), return_inverse=True)
+        rows = self.add_learners(unique_ids.tolist())[id_inverse]
+        cols = self.columns_for(subtopics)
+
+        # Occurrence rank of each event within its (row, col) pair
+        pair = rows * len(self.subtopics) + cols
+        order = np.argsort(pair, kind="stable")
+        sorted_pair = pair[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(sorted_pair)) + 1]
+        run_start = np.repeat(starts, np.diff(np.r_[starts, len(sorted_pair)]))
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order)) - run_start
+
+        for r in range(int(rank.max()) + 1):
+            idx = np.flatnonzero(rank == r)
+            self._scores[rows[idx], cols[idx]] = ema(self._scores[rows[idx], cols[idx]], evals[idx])
+
+    # --- analytics ---
+    def weakest_topics(self) -> np.ndarray:
+        """Weakest subtopic per learner (first one on ties, like get_weakest_topic)."""
+        return np.asarray(self.subtopics)[np.argmin(self.scores, axis=1)]
+
+    def tiers(self) -> np.ndarray:
+        """(n_learners, n_subtopics) tier names."""
+        return SUBTOPIC_TIERS[tier_index(self.scores)]
+
+    def cohort_stats(self, bins: int = 10) -> dict:
+        scores = self.scores
+        if len(scores) == 0:
+            return {"learners": 0}
+        # Learners at or above each tier bound, per subtopic; differences give the tier counts
+        at_least = np.vstack([np.full(len(self.subtopics), len(scores))] +
+                             [(scores >= bound).sum(axis=0) for bound in SUBTOPIC_TIER_BOUNDS] +
+                             [np.zeros(len(self.subtopics), dtype=np.int64)])
+        tier_counts = (at_least[:-1] - at_least[1:]).T
+        weakest = np.bincount(np.argmin(scores, axis=1), minlength=len(self.subtopics))
+        histogram, edges = np.histogram(scores.mean(axis=1), bins=bins, range=(0.0, 1.0))
+        return {
+            "learners": len(scores),
+            "mean_by_subtopic": dict(zip(self.subtopics, np.round(scores.mean(axis=0), 4).tolist())),
+            "weakest_topic_counts": {s: int(c) for s, c in zip(self.subtopics, weakest) if c},
+            "tier_distribution": {
+                s: dict(zip(SUBTOPIC_TIERS.tolist(), counts))
+                for s, counts in zip(self.subtopics, tier_counts.tolist())
+            },
+            "mastery_histogram": {"edges": np.round(edges, 2).tolist(), "counts": histogram.tolist()},
+        }
+
+
+# --------------------------------------------------
+# BENCHMARK: python -m member3.learner_state
+# --------------------------------------------------
+if __name__ == "__main__":
+    import json
+
+    with open("expert_knowledge.json", encoding="utf-8") as f:
+        subtopics = [c["subtopic"] for c in json.load(f)]
+
+    n_learners, n_events = 100_000, 1_000_000
+    rng = np.random.default_rng(7)
+    state = LearnerState(subtopics, capacity=n_learners)
+
+    ids = rng.integers(0, n_learners, n_events)
+    topics = rng.integers(0, len(subtopics), n_events)   # column indices
+    evals = rng.random(n_events).round(2)
+
+    state.add_learners(range(n_learners))
+    start = time.perf_counter()
+    state.apply_events(ids, topics, evals)
+    print(f"apply_events: {n_events:,} events over {n_learners:,} learners in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    stats = state.cohort_stats()
+    state.weakest_topics()
+    print(f"cohort_stats + weakest_topics: {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"mastery histogram: {stats['mastery_histogram']['counts']}")
@@ -1,5 +1,8 @@
 # member3/profile_rules.py
 
+# Every persona infer_user_profile can return
+PERSONAS = ["beginner", "theory_aware", "practitioner", "advanced", "domain_user"]
+
 def infer_user_profile(answers):
     # Rule-based logic from PRD
     # Priorities: 
@@ -1,8 +1,12 @@
 # member3/score_update.py
 # member3/score_update.py
 
+from member3.learner_state import ema
+
+
 def update_score(old_score: float, eval_score: float) -> float:
     """
     Smooth score update to avoid sudden jumps
+    (same kernel as the vectorized LearnerState engine)
     """
-    return round(0.7 * old_score + 0.3 * eval_score, 3)
+    return float(ema(old_score, eval_score))
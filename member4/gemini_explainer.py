@@ -1,23 +1,22 @@
-import os
-import google.generativeai as genai
+import hashlib
+
+from llm_provider import get_provider
+from llm_client import get_client
+from metrics import span, inc
+from singleflight import SingleFlight
 
 # --------------------------------------------------
-# GEMINI CONFIGURATION (ONLY GEMINI_API_KEY)
+# LLM CONFIGURATION
 # --------------------------------------------------
+# The backend is chosen by LLM_PROVIDER (see llm_provider.py):
+# Gemini by default, or the offline stub for load tests.
+# Creating the provider at import keeps the old fail-fast behaviour on a missing key.
+get_provider()
 
-API_KEY = os.getenv("GEMINI_API_KEY")
-
-if not API_KEY:
-    raise RuntimeError(
-        "GEMINI_API_KEY not set.\n"
-        "Run this once in PowerShell:\n"
-        "setx GEMINI_API_KEY \"your_api_key_here\""
-    )
-
-genai.configure(api_key=API_KEY)
-
-# Use a valid, stable Gemini model
-model = genai.GenerativeModel("models/gemini-2.5-flash")
+# Identical prompts in flight at the same time share one LLM call.
+# Right after onboarding every score is 0.3, so learners with the same
+# persona/intent all land on the same subtopic and send the same prompt.
+_inflight = SingleFlight()
 
 # --------------------------------------------------
 # PROMPT BUILDER (GUARDRAILED & ADAPTIVE)
@@ -76,20 +75,29 @@ CHECKPOINT QUESTION:
 # MAIN EXPLANATION FUNCTION (CALLED BY BACKEND)
 # --------------------------------------------------
 
+def _generate(prompt):
+    # Rate limiting, retries, circuit breaking and timeouts live in llm_client
+    return get_client().generate(prompt).strip()
+
+
 def explain_chunk(chunk, persona, intent, mastery_level):
     """
-    Calls Gemini using a strictly controlled prompt.
+    Calls the configured LLM (Gemini by default) using a strictly controlled prompt.
+    Raises llm_provider.LLMError when the LLM is unavailable.
     """
 
-    prompt = build_prompt(
-        chunk=chunk,
-        persona=persona,
-        intent=intent,
-        mastery_level=mastery_level
-    )
-
-    response = model.generate_content(prompt)
-    raw_text = response.text.strip()
+    with span("prompt_build"):
+        prompt = build_prompt(
+            chunk=chunk,
+            persona=persona,
+            intent=intent,
+            mastery_level=mastery_level
+        )
+
+    prompt_key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    raw_text, shared = _inflight.do(prompt_key, _generate, prompt)
+    if shared:
+        inc("llm_coalesced_total")
 
     # Simple parsing logic
     explanation_marker = "EXPLANATION:"
@@ -0,0 +1,165 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# --------------------------------------------------
+# LIGHTWEIGHT IN-PROCESS METRICS (PROMETHEUS TEXT FORMAT)
+# --------------------------------------------------
+# A span costs two perf_counter() calls, one bisect and one short lock,
+# i.e. a few microseconds against tutor turns that take milliseconds to seconds.
+
+# Seconds; covers sub-millisecond FAISS searches up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    "tutor_stage_seconds": ("histogram", "Time spent per hot-path stage (embed, faiss_search, prompt_build, llm, rubric_eval)."),
+    "http_request_duration_seconds": ("histogram", "End-to-end HTTP request latency."),
+    "cache_hits_total": ("counter", "Cache hits by cache name."),
+    "cache_misses_total": ("counter", "Cache misses by cache name."),
+    "llm_requests_total": ("counter", "LLM calls by provider and outcome."),
+    "llm_tokens_total": ("counter", "Approximate LLM tokens (4 characters per token) by direction."),
+    "llm_retries_total": ("counter", "LLM calls retried after a transient failure."),
+    "llm_circuit_trips_total": ("counter", "Times the LLM circuit breaker opened."),
+    "llm_coalesced_total": ("counter", "Explanation requests served by joining an identical in-flight LLM call."),
+    "event_log_events_total": ("counter", "Learner events committed to the append-only event log."),
+    "event_log_commit_seconds": ("histogram", "Duration of one group commit (write + fsync) of the event log."),
+    "event_log_snapshots_total": ("counter", "Event log snapshots written."),
+    "knowledge_reloads_total": ("counter", "Hot reloads of knowledge artifacts by artifact and outcome."),
+    "sidecar_requests_total": ("counter", "Search requests answered by the retrieval sidecar, by corpus."),
+    "sidecar_batches_total": ("counter", "Batched embed + search calls run by the retrieval sidecar."),
+    "sidecar_batch_seconds": ("histogram", "Duration of one retrieval sidecar batch (embed + search)."),
+    "grading_total": ("counter", "Background answer grades by outcome (applied, stale, error)."),
+    "grading_seconds": ("histogram", "Time to grade one answer on the grading queue."),
+    "relevance_gate_total": ("counter", "Relevance gate decisions (pass, block, override = false block, uncalibrated)."),
+    "relevance_best_distance": ("histogram", "L2 distance of the nearest chunk for queries checked by the relevance gate."),
+    "degraded_responses_total": ("counter", "Tutor turns served without the LLM, by reason (deadline, llm_error) and source (cached, static)."),
+    "live_fill_total": ("counter", "Live explanation generations run with a deadline, by outcome (ok, error)."),
+    "ws_connections_total": ("counter", "WebSocket tutor sessions opened."),
+    "ws_messages_total": ("counter", "WebSocket tutor session frames by direction and type."),
+    "prefetch_total": ("counter", "Speculative next-turn explanations by outcome (ok, error, over_budget, cancelled)."),
+}
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> float
+_histograms = {}  # (name, labels) -> [bucket_counts, sum, count]
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name: str, amount: float = 1.0, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + amount
+
+
+def observe(name: str, value: float, **labels):
+    key = _key(name, labels)
+    slot = bisect.bisect_left(DEFAULT_BUCKETS, value)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [[0] * (len(DEFAULT_BUCKETS) + 1), 0.0, 0]
+        hist[0][slot] += 1
+        hist[1] += value
+        hist[2] += 1
+
+
+@contextmanager
+def span(stage: str):
+    """Times one hot-path stage: `with span("faiss_search"): ...`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("tutor_stage_seconds", time.perf_counter() - start, stage=stage)
+
+
+def record_cache(cache: str, hit: bool):
+    inc("cache_hits_total" if hit else "cache_misses_total", cache=cache)
+
+
+def record_llm_call(provider: str, prompt: str, completion: str | None, outcome: str = "ok"):
+    inc("llm_requests_total", provider=provider, outcome=outcome)
+    inc("llm_tokens_total", len(prompt) // 4, direction="prompt")
+    if completion:
+        inc("llm_tokens_total", len(completion) // 4, direction="completion")
+
+
+# --------------------------------------------------
+# EXPOSITION
+# --------------------------------------------------
+def _escape(value) -> str:
+    # Prometheus text format: backslash, double quote and newline are escaped in label values
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def render_prometheus() -> str:
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: (list(v[0]), v[1], v[2]) for k, v in _histograms.items()}
+
+    lines = []
+    names = sorted({name for name, _ in counters} | {name for name, _ in histograms})
+    for name in names:
+        kind, help_text = METRIC_HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+        for (n, labels), (buckets, total, count) in sorted(histograms.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(DEFAULT_BUCKETS, buckets):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, {'le': f'{bound:g}'})} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, {'le': '+Inf'})} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Clears all series (used between benchmark runs)."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+# --------------------------------------------------
+# FASTAPI INTEGRATION
+# --------------------------------------------------
+def instrument_app(app):
+    """Adds request timing middleware and a Prometheus /metrics endpoint to a FastAPI app."""
+    from fastapi import Request
+    from fastapi.responses import PlainTextResponse
+
+    @app.middleware("http")
+    async def time_requests(request: Request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        # Label by route template (not raw path) to keep series cardinality bounded
+        route = request.scope.get("route")
+        path = getattr(route, "path", None) or "static"
+        observe("http_request_duration_seconds", time.perf_counter() - start,
+                method=request.method, path=path, status=f"{response.status_code // 100}xx")
+        return response
+
+    def metrics_endpoint():
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
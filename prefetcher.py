@@ -0,0 +1,199 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from explanation_pack import prompt_hash
+from llm_provider import LLMError
+from metrics import inc, record_cache
+from member3.score_update import update_score
+from member4.gemini_explainer import explain_chunk
+
+# --------------------------------------------------
+# SPECULATIVE PREFETCH OF THE NEXT TUTOR TURN
+# --------------------------------------------------
+# After a turn the learner needs tens of seconds to answer. tutor_step picks
+# the weakest subtopic *before* it grades the answer it received, so the next
+# turn's topic is decided by the scores as they stand when that turn starts:
+# the grade submitted in this turn (on the current topic) has been applied by
+# then, the learner's next answer has not. Since an eval score is always in
+# [0, 1], the current topic's score ends up between update_score(s, 0) and
+# update_score(s, 1) (or is already exact if that grade landed before the
+# prediction), so the next weakest topic is either the current one or the
+# runner-up. Both explanations are generated in the background and the next
+# turn is served from this cache.
+#
+# Live turns with a latency budget (LLM_DEADLINE_MS in backend_controller) use
+# fill(): the generation runs here and is cached whether or not the turn waited
+# for it, and an expired entry is still served by get_stale() as a degraded
+# answer when the LLM misses the budget.
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_MAX_IN_FLIGHT = int(os.getenv("PREFETCH_MAX_IN_FLIGHT", "2"))
+PREFETCH_BUDGET_PER_MINUTE = int(os.getenv("PREFETCH_BUDGET_PER_MINUTE", "20"))  # speculative LLM calls
+PREFETCH_TTL_SECONDS = float(os.getenv("PREFETCH_TTL_SECONDS", "600"))
+PREFETCH_CACHE_SIZE = int(os.getenv("PREFETCH_CACHE_SIZE", "64"))
+LIVE_FILL_WORKERS = int(os.getenv("LIVE_FILL_WORKERS", "8"))   # live generations with a deadline
+
+
+def predict_next_topics(scores: dict, current_topic: str) -> list[str]:
+    """
+    Subtopics the next turn can pick as the weakest once this turn's grade on
+    `current_topic` is applied, most likely first. Ties follow get_weakest_topic (min() keeps dict order).
+    """
+    others = {t: s for t, s in scores.items() if t != current_topic}
+    if not others:
+        return [current_topic]
+    runner_up = min(others, key=others.get)
+
+    low = update_score(scores[current_topic], 0.0)   # worst possible answer
+    high = update_score(scores[current_topic], 1.0)  # perfect answer
+
+    candidates = []
+    if low <= others[runner_up]:
+        candidates.append(current_topic)
+    if high > others[runner_up]:
+        candidates.append(runner_up)
+    return candidates
+
+
+class Prefetcher:
+    """
+    Bounded cache of explain_chunk results keyed by (chunk id, persona, intent,
+    prompt hash), filled by a small background pool. The prompt hash (as in
+    explanation_pack) makes entries for an edited chunk or prompt template miss
+    after a curriculum hot reload, for get_stale() too; they age out of the LRU.
+      - budget: at most `budget_per_minute` speculative LLM calls (sliding window)
+      - cancellation: cancel() drops queued prefetches that have not started;
+        a call already on the wire finishes and is still cached
+      - live requests for a prompt being prefetched join that call (single-flight
+        in gemini_explainer), so prefetching never doubles the work
+      - fill(): unbudgeted live generation on its own pool, joining a pending
+        prefetch of the same key
+    """
+
+    def __init__(self, max_in_flight: int = PREFETCH_MAX_IN_FLIGHT,
+                 budget_per_minute: int = PREFETCH_BUDGET_PER_MINUTE,
+                 ttl: float = PREFETCH_TTL_SECONDS, cache_size: int = PREFETCH_CACHE_SIZE):
+        self.budget_per_minute = budget_per_minute
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()   # key -> (response, stored_at)
+        self._pending = {}            # key -> Future
+        self._spent = deque()         # monotonic timestamps of speculative calls
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="prefetch")
+        self._live_executor = ThreadPoolExecutor(max_workers=LIVE_FILL_WORKERS, thread_name_prefix="live-fill")
+
+    @staticmethod
+    def key(chunk, persona, intent):
+        return chunk["id"], persona, intent, prompt_hash(chunk, persona, intent)
+
+    # --- cache ---
+    def get(self, chunk, persona, intent) -> dict | None:
+        key = self.key(chunk, persona, intent)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                entry = None   # expired: a miss, but kept for get_stale until evicted or replaced
+        record_cache("prefetch", entry is not None)
+        return entry[0] if entry else None
+
+    def get_stale(self, chunk, persona, intent) -> dict | None:
+        """Cached response regardless of age (a degraded answer beats none)."""
+        with self._lock:
+            entry = self._cache.get(self.key(chunk, persona, intent))
+        return entry[0] if entry else None
+
+    def put(self, chunk, persona, intent, response: dict):
+        key = self.key(chunk, persona, intent)
+        with self._lock:
+            self._cache[key] = (response, time.monotonic())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # --- speculation ---
+    def _take_budget(self) -> bool:
+        now = time.monotonic()
+        while self._spent and now - self._spent[0] > 60:
+            self._spent.popleft()
+        if len(self._spent) >= self.budget_per_minute:
+            return False
+        self._spent.append(now)
+        return True
+
+    def _run(self, key, chunk, persona, intent, counter="prefetch_total"):
+        """Generates and caches one explanation; returns it, or None when the LLM failed."""
+        try:
+            response = explain_chunk(chunk=chunk, persona=persona, intent=intent, mastery_level=persona)
+            self.put(chunk, persona, intent, response)
+            inc(counter, outcome="ok")
+            return response
+        except LLMError as e:
+            inc(counter, outcome="error")
+            print(f"Generation failed for {chunk['subtopic']}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def schedule(self, chunk, persona, intent) -> bool:
+        """Queues one speculative generation. Returns False when freshly cached, pending or over budget."""
+        if not PREFETCH_ENABLED:
+            return False
+        key = self.key(chunk, persona, intent)
+        with self._lock:
+            entry = self._cache.get(key)
+            fresh = entry is not None and time.monotonic() - entry[1] <= self.ttl
+            if fresh or key in self._pending:   # an expired entry (kept for get_stale) is refetched
+                return False
+            if not self._take_budget():
+                inc("prefetch_total", outcome="over_budget")
+                return False
+            self._pending[key] = self._executor.submit(self._run, key, chunk, persona, intent)
+        return True
+
+    def fill(self, chunk, persona, intent):
+        """
+        Live generation that is cached when it completes, even if the caller
+        stopped waiting. Joins a pending generation of the same key. Returns a
+        Future of the response (None when the LLM failed).
+        """
+        key = self.key(chunk, persona, intent)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None or future.cancelled():
+                future = self._pending[key] = self._live_executor.submit(
+                    self._run, key, chunk, persona, intent, "live_fill_total")
+        return future
+
+    def cancel(self) -> int:
+        """Drops queued prefetches (e.g. the session was reset). Returns how many were cancelled."""
+        with self._lock:
+            cancelled = [key for key, future in self._pending.items() if future.cancel()]
+            for key in cancelled:
+                del self._pending[key]
+        if cancelled:
+            inc("prefetch_total", len(cancelled), outcome="cancelled")
+        return len(cancelled)
+
+    def clear(self):
+        self.cancel()
+        with self._lock:
+            self._cache.clear()
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Prefetcher:
+    """Process-wide prefetcher used by backend_controller."""
+    global _prefetcher
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = Prefetcher()
+    return _prefetcher
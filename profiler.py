@@ -0,0 +1,126 @@
+import os
+import re
+import sys
+import time
+import uuid
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+# --------------------------------------------------
+# PER-REQUEST SAMPLING PROFILER
+# --------------------------------------------------
+# Off by default: a request is only profiled when it sends the header
+# `X-Debug-Profile: 1` or the query flag `?profile=1`. A background thread then
+# samples the stack of the thread serving that request and writes a
+# flamegraph-compatible collapsed-stack file (flamegraph.pl, speedscope, inferno).
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "1") == "1"     # kill switch for production
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL = float(os.getenv("PROFILER_INTERVAL_MS", "5")) / 1000
+MAX_CONCURRENT_PROFILES = int(os.getenv("PROFILER_MAX_CONCURRENT", "1"))
+MAX_PROFILE_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+
+PROFILE_HEADER = "x-debug-profile"
+PROFILE_QUERY_FLAG = "profile"
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+# Under load, extra profile requests are simply served unprofiled
+_slots = threading.BoundedSemaphore(MAX_CONCURRENT_PROFILES)
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval from a helper thread."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.profile_id = uuid.uuid4().hex
+        self.stacks = Counter()
+        self.samples = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{self.profile_id[:8]}", daemon=True)
+
+    def _run(self):
+        deadline = time.monotonic() + MAX_PROFILE_SECONDS
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()  # must be read on the profiled thread
+        self._thread.start()
+
+    def stop(self):
+        self.cpu_seconds = time.thread_time() - self._cpu_start
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self._stop.set()
+        self._thread.join()
+
+    def write(self) -> str:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{self.profile_id}.collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def summary(self) -> dict:
+        """CPU vs wall time tells CPU-bound work apart from waiting on the network."""
+        return {
+            "profile_id": self.profile_id,
+            "samples": self.samples,
+            "wall_ms": round(self.wall_seconds * 1000, 1),
+            "cpu_ms": round(self.cpu_seconds * 1000, 1),
+            "waiting_ms": round(max(0.0, self.wall_seconds - self.cpu_seconds) * 1000, 1),
+        }
+
+
+def is_requested(request) -> bool:
+    flag = request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY_FLAG)
+    return PROFILER_ENABLED and flag is not None and flag.lower() in ("1", "true", "yes")
+
+
+@contextmanager
+def profile_request(request):
+    """
+    Profiles the body of the `with` block when the request asked for it.
+    Yields the SamplingProfiler (None when profiling is off, not requested or all slots are busy).
+    Must run on the thread that does the work, i.e. inside a sync FastAPI endpoint.
+    """
+    if not is_requested(request) or not _slots.acquire(blocking=False):
+        yield None
+        return
+
+    profiler = SamplingProfiler(threading.get_ident())
+    try:
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            profiler.write()
+    finally:
+        _slots.release()
+
+
+def load_profile(profile_id: str) -> str | None:
+    """Returns the collapsed stacks of a saved profile, or None for unknown/invalid ids."""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.collapsed")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import argparse
+import threading
+
+import numpy as np
+
+from metrics import inc, observe
+from topic_matcher import TopicMatcher
+
+# --------------------------------------------------
+# RELEVANCE GATE (OFF-CURRICULUM QUERIES SKIP THE LLM)
+# --------------------------------------------------
+# The retriever always returns k chunks, even for "what's the weather in
+# Paris?", and main_app then pays a full LLM call for an answer the prompt
+# tells the model to refuse. The FAISS distances index.search already returns
+# say how far the query is from the curriculum: when even the nearest chunk is
+# farther than a calibrated threshold, the query is answered with a canned
+# response instead.
+#
+# Calibration (python relevance_gate.py) runs in-scope queries (every
+# curriculum name plus benchmark_queries.json) and OFF_TOPIC_PROBES through the
+# retriever and picks the smallest threshold that still passes TARGET_RECALL of
+# the in-scope queries; the precision/recall it reaches on the probes is stored
+# with it. The file is stamped with the index's content version: after a
+# rebuild or hot reload the gate lets everything through until it is
+# recalibrated. (With RETRIEVAL_MODE=sidecar the web worker does not know the
+# index version and trusts the file.)
+#
+# At runtime a blocked query that names a curriculum topic (TopicMatcher) is let
+# through anyway and counted as a false block, so
+#   block / (block + override)   in relevance_gate_total
+# is the gate's live precision.
+
+RELEVANCE_GATE = os.getenv("RELEVANCE_GATE", "1") == "1"
+RELEVANCE_CALIBRATION_FILE = os.getenv("RELEVANCE_CALIBRATION_FILE", "relevance_gate.json")
+RELEVANCE_MAX_DISTANCE = os.getenv("RELEVANCE_MAX_DISTANCE")   # overrides the calibrated threshold
+TARGET_RECALL = 0.99      # share of in-scope calibration queries the threshold must pass
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_QUERIES = os.path.join(BASE_DIR, "benchmark_queries.json")
+
+OFF_TOPIC_PROBES = [
+    "What's the weather like in Paris tomorrow?",
+    "Give me a recipe for chocolate chip cookies",
+    "Who won the football world cup in 2018?",
+    "How do I change a flat tire on my bike?",
+    "Recommend a good fantasy novel to read",
+    "What is the capital of Australia?",
+    "How tall is Mount Everest?",
+    "Write a poem about the ocean",
+    "What time does the supermarket close on Sunday?",
+    "How do I get a stain out of a wool sweater?",
+    "Tell me a joke about cats",
+    "Who painted the Mona Lisa?",
+    "How many calories are in a banana?",
+    "What are the rules of chess castling?",
+    "Translate good morning into Italian",
+    "Best places to visit in Japan in spring",
+    "How do I fix a leaking kitchen faucet?",
+    "What is the plot of Hamlet?",
+    "How long should I boil an egg?",
+    "Which planets have rings?",
+]
+
+OFF_TOPIC_ANSWER = (
+    "That question is outside the Machine Learning curriculum I teach, so I can't answer it here. "
+    "Please choose a core ML concept from the curriculum *(e.g., 'Linear Regression', 'Bias-Variance Tradeoff')*."
+)
+
+
+# --------------------------------------------------
+# GATE
+# --------------------------------------------------
+class RelevanceGate:
+    def __init__(self, calibration: dict | None):
+        self.calibration = calibration or {}
+        self.threshold = float(RELEVANCE_MAX_DISTANCE) if RELEVANCE_MAX_DISTANCE else self.calibration.get("threshold")
+        self._matcher = None
+
+    def _names_curriculum_topic(self, query: str) -> bool:
+        if self._matcher is None:
+            from topic_neighbors import curriculum_names
+            self._matcher = TopicMatcher(curriculum_names(), fuzzy=False)
+        return self._matcher.match(query) is not None
+
+    def check(self, query: str, distances: list[float], version: str | None) -> bool:
+        """True when the query may go to the LLM. distances = L2 distances of the retrieved chunks."""
+        if not distances:
+            return True   # nothing retrieved: the caller already handles that
+        best = min(distances)
+        observe("relevance_best_distance", best)
+        # version None: the retrieval sidecar owns the index, so the stamp cannot be checked here
+        calibrated = RELEVANCE_MAX_DISTANCE or version is None or self.calibration.get("version") == version
+        if self.threshold is None or not calibrated:
+            inc("relevance_gate_total", decision="uncalibrated")
+            return True
+        if best <= self.threshold:
+            inc("relevance_gate_total", decision="pass")
+            return True
+        if self._names_curriculum_topic(query):
+            inc("relevance_gate_total", decision="override")   # false block: counts against precision
+            return True
+        inc("relevance_gate_total", decision="block")
+        return False
+
+
+_gate = None
+_gate_lock = threading.Lock()
+
+
+def get_relevance_gate() -> RelevanceGate:
+    """Process-wide gate with the calibration file loaded once."""
+    global _gate
+    if _gate is None:
+        with _gate_lock:
+            if _gate is None:
+                calibration = None
+                if os.path.exists(RELEVANCE_CALIBRATION_FILE):
+                    with open(RELEVANCE_CALIBRATION_FILE, encoding="utf-8") as f:
+                        calibration = json.load(f)
+                _gate = RelevanceGate(calibration)
+                if _gate.threshold is None:
+                    print(f"Relevance gate: '{RELEVANCE_CALIBRATION_FILE}' not found, every query passes "
+                          "(run python relevance_gate.py).")
+                elif calibration and not RELEVANCE_MAX_DISTANCE:
+                    print(f"Relevance gate: max distance {_gate.threshold:.4f} "
+                          f"(calibrated precision {calibration['precision']:.2f}, recall {calibration['recall']:.2f})")
+                else:
+                    print(f"Relevance gate: max distance {_gate.threshold:.4f} (RELEVANCE_MAX_DISTANCE)")
+    return _gate
+
+
+def is_relevant(query: str, distances: list[float], version: str | None) -> bool:
+    return not RELEVANCE_GATE or get_relevance_gate().check(query, distances, version)
+
+
+# --------------------------------------------------
+# CALIBRATION (python relevance_gate.py)
+# --------------------------------------------------
+def best_distances(retriever, queries: list[str], k: int) -> np.ndarray:
+    return np.array([min((d for d, _ in retriever.retrieve_scored(q, k)[0]), default=np.inf) for q in queries])
+
+
+def pick_threshold(in_scope: np.ndarray, off_topic: np.ndarray, target_recall: float = TARGET_RECALL) -> dict:
+    """Smallest threshold passing target_recall of in-scope queries, with its precision/recall on the probes."""
+    threshold = float(np.quantile(in_scope, target_recall, method="higher"))
+    blocked_off = int((off_topic > threshold).sum())
+    blocked_in = int((in_scope > threshold).sum())
+    return {
+        "threshold": round(threshold, 6),
+        "recall": round(float((in_scope <= threshold).mean()), 4),          # in-scope queries passed
+        "precision": round(blocked_off / (blocked_off + blocked_in), 4) if blocked_off + blocked_in else 1.0,
+        "off_topic_blocked": round(blocked_off / len(off_topic), 4) if len(off_topic) else 0.0,
+        "in_scope_queries": len(in_scope),
+        "off_topic_queries": len(off_topic),
+    }
+
+
+def calibrate(path: str = RELEVANCE_CALIBRATION_FILE, k: int = 4, target_recall: float = TARGET_RECALL):
+    from retriever import RAGRetriever
+    from topic_neighbors import curriculum_names
+
+    start = time.perf_counter()
+    retriever = RAGRetriever()
+    if not retriever.is_ready:
+        raise SystemExit("Retriever is not ready; build the index first (python data_processor.py).")
+    in_scope = curriculum_names()
+    if os.path.exists(BENCHMARK_QUERIES):
+        with open(BENCHMARK_QUERIES, encoding="utf-8") as f:
+            in_scope += [q["query"] for q in json.load(f)]
+
+    result = pick_threshold(best_distances(retriever, in_scope, k),
+                            best_distances(retriever, OFF_TOPIC_PROBES, k), target_recall)
+    result.update(metric="l2", k=k, version=retriever.artifacts.get_versioned()[1])
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    os.replace(path + ".tmp", path)
+    print(f"✅ max distance {result['threshold']:.4f}: passes {result['recall']:.1%} of {len(in_scope)} in-scope queries, "
+          f"blocks {result['off_topic_blocked']:.1%} of {len(OFF_TOPIC_PROBES)} off-topic probes "
+          f"(precision {result['precision']:.2f}, {time.perf_counter() - start:.1f}s) -> {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate the relevance gate's FAISS distance threshold.")
+    parser.add_argument("--output", default=RELEVANCE_CALIBRATION_FILE)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--target-recall", type=float, default=TARGET_RECALL)
+    args = parser.parse_args()
+    calibrate(args.output, args.k, args.target_recall)
@@ -0,0 +1,389 @@
+import os
+import sys
+import json
+import time
+import zlib
+import shutil
+import asyncio
+import argparse
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# --- Configuration ---
+DEFAULT_WORKERS = os.cpu_count() or 2
+BUCKETS_PER_WORKER = 8          # more buckets = fewer sessions held in memory per task
+MAX_TRAJECTORY_TURNS = 20       # score trajectory is reported for the first N turns
+INITIAL_SCORE = 0.3
+LATENCY_BUCKETS_PER_DECADE = 100   # percentiles within ~1.2% of the true latency
+MAX_REPORTED_TURNS = 1000          # turns-per-session histogram cap (longer sessions count as 1000)
+
+# --------------------------------------------------
+# OFFLINE SESSION REPLAY
+# --------------------------------------------------
+# Streams JSONL request logs and replays every session through tutor_step
+# (api.py) or ask_adaptive_question (main_app.py) against the stub LLM.
+#
+# 1. The parent reads the input line by line and appends each request to one of
+#    N spool files chosen by a hash of its session id, so a session always lands
+#    in one spool, in log order, and memory stays flat however large the log is.
+# 2. A process pool replays the spools. The backends keep one global learner,
+#    so a worker swaps the learner state in and out whenever the session changes.
+# 3. Workers fold latencies, final scores and session lengths into fixed-bucket
+#    histograms and return those; the parent merges them. Neither side keeps
+#    per-request values, so memory does not grow with the number of turns
+#    (a worker only holds the live state of the sessions in its current spool).
+#
+# Accepted line formats:
+#   request log: {"session_id": "...", "target": "tutor" | "ask", "answer" | "query": "..."}
+#   event log:   event_log.py segments ({"learner", "type", ...}); answers and topic
+#                selections are replayed, a "reset" starts a new session
+
+
+def parse_line(line: str) -> dict | None:
+    """Normalizes one log line to {"session", "target", "input"}; None when it is not a replayable request."""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict):
+        return None
+
+    if "type" in record and "learner" in record:
+        kind, session = record["type"], str(record["learner"])
+        if kind == "reset":
+            return {"session": session, "target": "tutor", "reset": True}
+        text = record.get("subtopic") if kind == "topic_selected" else record.get("answer")
+        if kind not in ("onboarding_answer", "evaluation", "topic_selected") or text is None:
+            return None
+        return {"session": session, "target": "tutor", "input": text}
+
+    session = record.get("session_id") or record.get("session")
+    if session is None:
+        return None
+    target = record.get("target", "ask" if "query" in record else "tutor")
+    text = record.get("answer", record.get("query", record.get("input")))
+    if target == "ask" and not text:
+        return None  # /ask requires a query
+    return {"session": str(session), "target": target, "input": text}
+
+
+def spool(paths: list[str], spool_dir: str, n_buckets: int) -> tuple[list[str], int, int]:
+    """Partitions requests by session into bucket files. Returns (bucket paths, requests, skipped lines)."""
+    bucket_paths = [os.path.join(spool_dir, f"bucket-{i:04d}.jsonl") for i in range(n_buckets)]
+    files = [open(p, "w", encoding="utf-8") for p in bucket_paths]
+    requests = skipped = 0
+    try:
+        for path in paths:
+            with (sys.stdin if path == "-" else open(path, encoding="utf-8")) as f:
+                for line in f:
+                    request = parse_line(line)
+                    if request is None:
+                        skipped += 1
+                        continue
+                    bucket = zlib.crc32(request["session"].encode("utf-8")) % n_buckets
+                    files[bucket].write(json.dumps(request) + "\n")
+                    requests += 1
+    finally:
+        for f in files:
+            f.close()
+    return bucket_paths, requests, skipped
+
+
+# --------------------------------------------------
+# WORKER
+# --------------------------------------------------
+def init_worker(llm_latency_ms: float):
+    # Offline and side-effect free: stub LLM, no rate limit, no speculation, no event log, inline grading
+    os.environ["LLM_PROVIDER"] = "stub"
+    os.environ["STUB_LLM_LATENCY_MS"] = str(llm_latency_ms)
+    os.environ["LLM_RATE_PER_SECOND"] = "1000000"
+    os.environ["LLM_BURST"] = "1000000"
+    os.environ["PREFETCH_ENABLED"] = "0"
+    os.environ["EVENT_LOG_ENABLED"] = "0"
+    os.environ["GRADING_ASYNC"] = "0"  # each turn's score must include its own grade
+    os.environ["LLM_DEADLINE_MS"] = "0"  # replays compare full LLM turns, never degraded ones
+    # The backends narrate every turn on stdout; keep the worker output to errors (stderr)
+    sys.stdout = open(os.devnull, "w")
+
+
+# --------------------------------------------------
+# FIXED-BUCKET HISTOGRAMS (CONSTANT MEMORY, MERGEABLE)
+# --------------------------------------------------
+class Histogram:
+    """
+    Counts per fixed bucket. Each bucket reports one representative value, so a
+    percentile is exact up to the bucket width; merging is adding counts.
+    """
+
+    def __init__(self, edges: np.ndarray, values: np.ndarray):
+        self.edges = edges                 # bucket i holds edges[i-1] <= x < edges[i]
+        self.values = values               # representative per bucket (len(edges) + 1)
+        self.counts = np.zeros(len(values), dtype=np.int64)
+
+    @classmethod
+    def log(cls, low: float, high: float, per_decade: int) -> "Histogram":
+        edges = np.logspace(np.log10(low), np.log10(high), int(round(np.log10(high / low) * per_decade)) + 1)
+        middles = np.sqrt(edges[:-1] * edges[1:])
+        return cls(edges, np.concatenate([[low], middles, [high]]))
+
+    @classmethod
+    def exact(cls, values: np.ndarray) -> "Histogram":
+        """One bucket per value (e.g. 3-decimal scores, integer counts); values outside clamp to the ends."""
+        edges = (values[:-1] + values[1:]) / 2
+        return cls(edges, values)
+
+    def add(self, value: float):
+        self.counts[np.searchsorted(self.edges, value, side="right")] += 1
+
+    def merge(self, other: "Histogram"):
+        self.counts += other.counts
+
+    @property
+    def n(self) -> int:
+        return int(self.counts.sum())
+
+    def percentile(self, q: float) -> float:
+        rank = max(1, int(np.ceil(q / 100 * self.n)))   # nearest rank
+        return float(self.values[np.searchsorted(np.cumsum(self.counts), rank)])
+
+
+def latency_histogram() -> Histogram:
+    return Histogram.log(1e-6, 1e3, LATENCY_BUCKETS_PER_DECADE)   # seconds
+
+
+def score_histogram() -> Histogram:
+    return Histogram.exact(np.round(np.arange(1001) / 1000, 3))   # scores have 3 decimals
+
+
+def turns_histogram() -> Histogram:
+    return Histogram.exact(np.arange(MAX_REPORTED_TURNS + 1, dtype=np.float64))
+
+
+class TutorSession:
+    """Swaps one learner's state into backend_controller's globals."""
+
+    def __init__(self):
+        import backend_controller
+        self.bc = backend_controller
+        self.subtopics = list(backend_controller.LEARNER_SCORES)
+
+    def fresh(self) -> dict:
+        return {"profile": None, "onboarding": {}, "topic_selected": False,
+                "scores": {s: INITIAL_SCORE for s in self.subtopics}}
+
+    def load(self, state: dict):
+        self.bc.USER_PROFILE = state["profile"]
+        self.bc.ONBOARDING_ANSWERS = state["onboarding"]
+        self.bc.TOPIC_SELECTED = state["topic_selected"]
+        self.bc.LEARNER_SCORES = state["scores"]
+
+    def save(self) -> dict:
+        return {"profile": self.bc.USER_PROFILE, "onboarding": self.bc.ONBOARDING_ANSWERS,
+                "topic_selected": self.bc.TOPIC_SELECTED, "scores": self.bc.LEARNER_SCORES}
+
+    def stage(self) -> str:
+        if self.bc.USER_PROFILE is None:
+            return "onboarding"
+        return "answer" if self.bc.TOPIC_SELECTED else "topic_selection"
+
+    def step(self, text):
+        self.bc.tutor_step(text)
+        return float(np.mean(list(self.bc.LEARNER_SCORES.values())))
+
+    def persona(self):
+        return self.bc.USER_PROFILE["persona"] if self.bc.USER_PROFILE else None
+
+
+class AskSession:
+    """Swaps one learner's dialogue state into main_app.USER_STATE."""
+
+    def __init__(self):
+        import main_app
+        if not main_app.rag_retriever_is_ready:
+            main_app.load_rag_components()
+        self.app = main_app
+        self.rag_system = (main_app.rag_retriever, main_app.rag_generator)
+
+    def fresh(self) -> dict:
+        return {"knowledge_score": 50, "last_question": None, "current_topic": "General ML"}
+
+    def load(self, state: dict):
+        self.app.USER_STATE[self.app.USER_ID] = state
+
+    def save(self) -> dict:
+        return self.app.USER_STATE[self.app.USER_ID]
+
+    def stage(self) -> str:
+        return self.app.USER_STATE[self.app.USER_ID]["last_question"] or "start"
+
+    def step(self, text):
+        query = self.app.QueryInput(query=text)
+        asyncio.run(self.app.ask_adaptive_question(query, self.rag_system))
+        return self.app.USER_STATE[self.app.USER_ID]["knowledge_score"] / 100
+
+    def persona(self):
+        return None
+
+
+def replay_bucket(path: str) -> dict:
+    """Replays every session of one spool file in order."""
+    runners = {}
+    states = {}       # session -> saved backend state
+    turns = Counter()  # session -> turns replayed
+    epochs = Counter()  # learner -> resets seen (session = learner + epoch)
+    current = None
+    latencies = {}    # stage -> Histogram of seconds
+    traj_sum = np.zeros(MAX_TRAJECTORY_TURNS)
+    traj_count = np.zeros(MAX_TRAJECTORY_TURNS, dtype=np.int64)
+    final_scores = {}  # live sessions only; folded into the histograms at the end of the spool
+    personas = {}
+    errors = 0
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            request = json.loads(line)
+            target = request["target"]
+            if target not in runners:
+                runners[target] = TutorSession() if target == "tutor" else AskSession()
+            runner = runners[target]
+            learner = (target, request["session"])
+
+            if request.get("reset"):
+                # The learner starts over: later requests count as a new session
+                states.pop((*learner, epochs[learner]), None)
+                if current is not None and current[:2] == learner:
+                    current = None
+                epochs[learner] += 1
+                continue
+
+            key = (*learner, epochs[learner])
+            if current != key:
+                if current is not None:
+                    states[current] = runners[current[0]].save()
+                runner.load(states.pop(key, None) or runner.fresh())
+                current = key
+
+            stage = runner.stage()
+            start = time.perf_counter()
+            try:
+                score = runner.step(request["input"])
+            except Exception as e:
+                errors += 1
+                print(f"   {request['session']}: {e}", file=sys.stderr)
+                continue
+            if stage not in latencies:
+                latencies[stage] = latency_histogram()
+            latencies[stage].add(time.perf_counter() - start)
+
+            turn = turns[key]
+            if turn < MAX_TRAJECTORY_TURNS:
+                traj_sum[turn] += score
+                traj_count[turn] += 1
+            turns[key] += 1
+            final_scores[key] = score
+            personas[key] = runner.persona()
+
+    scores, lengths = score_histogram(), turns_histogram()
+    for score in final_scores.values():
+        scores.add(score)
+    for count in turns.values():
+        lengths.add(count)
+    return {
+        "latencies": latencies,
+        "traj_sum": traj_sum,
+        "traj_count": traj_count,
+        "final_scores": scores,
+        "turns": lengths,
+        "personas": Counter(p for p in personas.values() if p),
+        "errors": errors,
+    }
+
+
+# --------------------------------------------------
+# AGGREGATION
+# --------------------------------------------------
+def percentiles(hist: Histogram, scale=1.0) -> dict:
+    if hist.n == 0:
+        return {"n": 0}
+    return {
+        "n": hist.n,
+        "p50": round(hist.percentile(50) * scale, 3),
+        "p95": round(hist.percentile(95) * scale, 3),
+        "p99": round(hist.percentile(99) * scale, 3),
+    }
+
+
+def merged(histograms, empty) -> Histogram:
+    total = empty()
+    for hist in histograms:
+        total.merge(hist)
+    return total
+
+
+def aggregate(results: list[dict], elapsed: float, requests: int, skipped: int) -> dict:
+    if not results:
+        return {"requests": requests, "skipped_lines": skipped, "sessions": 0}
+    stages = {}
+    for r in results:
+        for stage, hist in r["latencies"].items():
+            stages.setdefault(stage, latency_histogram()).merge(hist)
+    all_latencies = merged(stages.values(), latency_histogram)
+
+    traj_sum = sum(r["traj_sum"] for r in results)
+    traj_count = sum(r["traj_count"] for r in results)
+    final_scores = merged((r["final_scores"] for r in results), score_histogram)
+    turns = merged((r["turns"] for r in results), turns_histogram)
+
+    return {
+        "requests": requests,
+        "skipped_lines": skipped,
+        "errors": sum(r["errors"] for r in results),
+        "sessions": turns.n,
+        "elapsed_s": round(elapsed, 2),
+        "turns_per_second": round(all_latencies.n / elapsed, 1) if elapsed else None,
+        "latency_ms": percentiles(all_latencies, 1000),
+        "stages_ms": {stage: percentiles(hist, 1000) for stage, hist in stages.items()},
+        "turns_per_session": percentiles(turns),
+        "final_score": percentiles(final_scores),
+        "mean_score_by_turn": [round(float(s / c), 4) for s, c in zip(traj_sum, traj_count) if c],
+        "personas": dict(sum((r["personas"] for r in results), Counter())),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay JSONL session logs through the tutor against a stub LLM.")
+    parser.add_argument("logs", nargs="+", help="JSONL files (request logs or event_log segments); '-' for stdin.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--buckets", type=int, help=f"Spool files (default workers x {BUCKETS_PER_WORKER}).")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="Median stub LLM latency.")
+    parser.add_argument("--output", help="Optional JSON results file.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    spool_dir = tempfile.mkdtemp(prefix="replay-")
+    try:
+        buckets, requests, skipped = spool(args.logs, spool_dir, args.buckets or args.workers * BUCKETS_PER_WORKER)
+        print(f"--- Spooled {requests} requests into {len(buckets)} buckets ({skipped} lines skipped) ---")
+
+        results = []
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                 initargs=(args.llm_latency_ms,)) as pool:
+            for future in as_completed([pool.submit(replay_bucket, b) for b in buckets if os.path.getsize(b)]):
+                results.append(future.result())
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    summary = aggregate(results, time.perf_counter() - start, requests, skipped)
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+import os
+import json
+import queue
+import socket
+import struct
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import inc, observe, span
+from topic_neighbors import lookup_neighbors
+from runtime_config import apply_thread_budget, configure_runtime
+
+# --------------------------------------------------
+# OUT-OF-PROCESS RETRIEVAL SIDECAR
+# --------------------------------------------------
+# One daemon per host owns the sentence-transformer and the FAISS indexes and
+# answers search requests over a local Unix socket. Web workers started with
+# RETRIEVAL_MODE=sidecar never import torch/faiss: RAGRetriever and
+# member2.step5_faiss_demo become thin clients, so every worker stays small and
+# the daemon batches the queries of ALL workers into one encode + one
+# index.search call per corpus.
+#
+# Framing (big-endian), one request in flight per connection:
+#   request  = u32 length | u8 op | u8 corpus | u16 k | utf-8 query
+#   response = u32 length | u8 status | body
+#   search body = u32 n | n x (f32 score | u32 size | utf-8 payload)
+# The payload is the chunk text for the "rag" corpus and the chunk id for
+# "curriculum" (the client maps ids back to its own copy of expert_knowledge.json).
+#
+#   python retrieval_sidecar.py                       # serve
+#   RETRIEVAL_MODE=sidecar uvicorn api:app --workers 4
+
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "local")          # "local" | "sidecar"
+SIDECAR_SOCKET = os.getenv("RETRIEVAL_SIDECAR_SOCKET", "/tmp/ml_tutor_retrieval.sock")
+SIDECAR_POOL_SIZE = int(os.getenv("RETRIEVAL_SIDECAR_POOL_SIZE", "8"))    # idle connections kept per process
+SIDECAR_TIMEOUT = float(os.getenv("RETRIEVAL_SIDECAR_TIMEOUT", "5"))      # seconds per request
+BATCH_WINDOW_MS = float(os.getenv("RETRIEVAL_SIDECAR_BATCH_MS", "2"))    # wait for more queries before a batch
+MAX_BATCH = int(os.getenv("RETRIEVAL_SIDECAR_MAX_BATCH", "64"))
+
+OP_SEARCH, OP_PING, OP_STATS = 1, 2, 3
+CORPUS_RAG, CORPUS_CURRICULUM = 0, 1
+CORPUS_NAMES = {CORPUS_RAG: "rag", CORPUS_CURRICULUM: "curriculum"}
+STATUS_OK, STATUS_ERROR = 0, 1
+
+_LENGTH = struct.Struct("!I")
+_REQUEST = struct.Struct("!BBH")
+_STATUS = struct.Struct("!B")
+_HIT = struct.Struct("!fI")
+
+
+class SidecarError(Exception):
+    """The sidecar is unreachable or rejected the request."""
+
+
+# --------------------------------------------------
+# FRAMING
+# --------------------------------------------------
+def encode_request(op: int, corpus: int = 0, k: int = 0, query: str = "") -> bytes:
+    body = _REQUEST.pack(op, corpus, k) + query.encode("utf-8")
+    return _LENGTH.pack(len(body)) + body
+
+
+def decode_request(body: bytes) -> tuple[int, int, int, str]:
+    op, corpus, k = _REQUEST.unpack_from(body)
+    return op, corpus, k, body[_REQUEST.size:].decode("utf-8")
+
+
+def encode_response(status: int, body: bytes) -> bytes:
+    return _LENGTH.pack(len(body) + _STATUS.size) + _STATUS.pack(status) + body
+
+
+def encode_hits(hits: list[tuple[float, str]]) -> bytes:
+    parts = [_LENGTH.pack(len(hits))]
+    for score, payload in hits:
+        data = payload.encode("utf-8")
+        parts.append(_HIT.pack(score, len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_hits(body: bytes) -> list[tuple[float, str]]:
+    (n,), offset, hits = _LENGTH.unpack_from(body), _LENGTH.size, []
+    for _ in range(n):
+        score, size = _HIT.unpack_from(body, offset)
+        offset += _HIT.size
+        hits.append((score, body[offset:offset + size].decode("utf-8")))
+        offset += size
+    return hits
+
+
+# --------------------------------------------------
+# CLIENT (web workers)
+# --------------------------------------------------
+class SidecarClient:
+    """Thread-safe client; each call borrows a pooled connection, so concurrent requests use separate sockets."""
+
+    def __init__(self, path: str = SIDECAR_SOCKET, pool_size: int = SIDECAR_POOL_SIZE, timeout: float = SIDECAR_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.path)
+        return sock
+
+    def _release(self, sock):
+        try:
+            self._idle.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+
+    @staticmethod
+    def _recv_exact(sock, size: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < size:
+            chunk = sock.recv(size - len(buf))
+            if not chunk:
+                raise ConnectionError("sidecar closed the connection")
+            buf += chunk
+        return bytes(buf)
+
+    def _call(self, frame: bytes) -> bytes:
+        # A pooled socket may have been closed by a sidecar restart: retry once on a fresh one
+        for attempt in range(2):
+            try:
+                sock = self._idle.get_nowait() if attempt == 0 else None
+            except queue.Empty:
+                sock = None
+            try:
+                sock = sock or self._connect()
+                sock.sendall(frame)
+                (length,) = _LENGTH.unpack(self._recv_exact(sock, _LENGTH.size))
+                body = self._recv_exact(sock, length)
+            except OSError as e:
+                if sock:
+                    sock.close()
+                if attempt:
+                    raise SidecarError(f"retrieval sidecar at {self.path} unavailable: {e}") from e
+                continue
+            self._release(sock)
+            if body[0] != STATUS_OK:
+                raise SidecarError(body[1:].decode("utf-8"))
+            return body[1:]
+
+    def search(self, corpus: int, query: str, k: int) -> list[tuple[float, str]]:
+        """[(score, payload)] best first. Scores are the index's own (L2 distance for rag, cosine for curriculum)."""
+        with span("sidecar_search"):
+            return decode_hits(self._call(encode_request(OP_SEARCH, corpus, k, query)))
+
+    def ping(self) -> bool:
+        try:
+            self._call(encode_request(OP_PING))
+            return True
+        except SidecarError:
+            return False
+
+    def stats(self) -> dict:
+        return json.loads(self._call(encode_request(OP_STATS)))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_sidecar_client() -> SidecarClient:
+    """Process-wide client (one connection pool per worker)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SidecarClient()
+    return _client
+
+
+# --------------------------------------------------
+# SERVER (the daemon)
+# --------------------------------------------------
+class RetrievalSidecar:
+    def __init__(self, corpora: list[str]):
+        # The daemon is the one process that loads the model and indexes in-process
+        os.environ["RETRIEVAL_MODE"] = "local"
+        self.rag = None
+        self.curriculum = None
+        if "rag" in corpora:
+            from retriever import RAGRetriever
+            rag = RAGRetriever(use_sidecar=False)
+            self.rag = rag if rag.is_ready else None
+        if "curriculum" in corpora:
+            from member2 import step5_faiss_demo
+            self.curriculum = step5_faiss_demo
+        if not (self.rag or self.curriculum):
+            raise RuntimeError("No corpus could be loaded; nothing to serve.")
+
+        apply_thread_budget()
+
+        # Both corpora are embedded with all-MiniLM-L6-v2: encode each batch once
+        self.model = self.rag.model if self.rag else self.curriculum.model
+        self.loaded = {CORPUS_RAG: self.rag is not None, CORPUS_CURRICULUM: self.curriculum is not None}
+        self.stats = {"requests": 0, "batches": 0, "errors": 0}
+        self._queue = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sidecar-batch")
+
+    # --- batch execution (executor thread) ---
+    def run_batch(self, requests: list[tuple[int, int, str]]) -> list:
+        """requests = [(corpus, k, query)] -> [hits | Exception], in order."""
+        import faiss
+
+        # One artifact version per corpus for the whole batch
+        snapshots = {}
+        if self.rag:
+            (index, texts), version = self.rag.artifacts.get_versioned()
+            snapshots[CORPUS_RAG] = (index, texts, version)
+        if self.curriculum:
+            (chunks, index), version = self.curriculum.knowledge.get_versioned()
+            snapshots[CORPUS_CURRICULUM] = (index, [chunk["id"] for chunk in chunks], version)
+
+        # Curriculum names are answered from the precomputed neighbor table; only the rest is embedded
+        results = [None] * len(requests)
+        for i, (corpus, k, query) in enumerate(requests):
+            if corpus not in snapshots:
+                results[i] = SidecarError(f"corpus {corpus} is not served by this sidecar")
+                continue
+            _, payloads, version = snapshots[corpus]
+            known = lookup_neighbors(CORPUS_NAMES[corpus], query, k, version)
+            if known is not None:
+                results[i] = [(score, payloads[idx]) for idx, score in known if idx < len(payloads)]
+
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        queries = list(dict.fromkeys(requests[i][2] for i in pending))
+        row = {q: i for i, q in enumerate(queries)}
+        with span("embed"):
+            embeddings = self.model.encode(queries, convert_to_numpy=True, batch_size=MAX_BATCH).astype('float32')
+
+        for corpus in set(requests[i][0] for i in pending):
+            members = [i for i in pending if requests[i][0] == corpus]
+            index, payloads, _ = snapshots[corpus]
+            vectors = embeddings[[row[requests[i][2]] for i in members]]
+            if corpus == CORPUS_CURRICULUM:
+                vectors = vectors.copy()
+                faiss.normalize_L2(vectors)
+
+            k = min(max(requests[i][1] for i in members), index.ntotal)
+            with span("faiss_search"):
+                scores, indices = index.search(vectors, k)
+            for j, i in enumerate(members):
+                results[i] = [(float(s), payloads[idx]) for s, idx in zip(scores[j][:requests[i][1]], indices[j])
+                              if 0 <= idx < len(payloads)]
+        return results
+
+    # --- event loop ---
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + BATCH_WINDOW_MS / 1000
+            while len(batch) < MAX_BATCH:
+                remaining = deadline - loop.time()
+                if remaining <= 0 and self._queue.empty():
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), max(remaining, 0)))
+                except asyncio.TimeoutError:
+                    break
+
+            start = loop.time()
+            try:
+                results = await loop.run_in_executor(self._executor, self.run_batch, [r for r, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            observe("sidecar_batch_seconds", loop.time() - start)
+            inc("sidecar_batches_total")
+            self.stats["batches"] += 1
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+                op, corpus, k, query = decode_request(await reader.readexactly(length))
+                if op == OP_PING:
+                    writer.write(encode_response(STATUS_OK, b""))
+                elif op == OP_STATS:
+                    writer.write(encode_response(STATUS_OK, json.dumps(self.stats).encode("utf-8")))
+                elif op == OP_SEARCH and k > 0:
+                    future = loop.create_future()
+                    await self._queue.put(((corpus, k, query), future))
+                    result = await future
+                    self.stats["requests"] += 1
+                    inc("sidecar_requests_total", corpus=CORPUS_NAMES.get(corpus, str(corpus)))
+                    if isinstance(result, Exception):
+                        self.stats["errors"] += 1
+                        writer.write(encode_response(STATUS_ERROR, str(result).encode("utf-8")))
+                    else:
+                        writer.write(encode_response(STATUS_OK, encode_hits(result)))
+                else:
+                    writer.write(encode_response(STATUS_ERROR, f"bad request: op={op} k={k}".encode("utf-8")))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # client went away
+        finally:
+            writer.close()
+
+    async def serve(self, path: str = SIDECAR_SOCKET):
+        if os.path.exists(path):
+            os.remove(path)  # stale socket of a previous run
+        self._queue = asyncio.Queue()
+        server = await asyncio.start_unix_server(self._handle, path=path)
+        batcher = asyncio.create_task(self._batcher())
+        served = [name for code, name in CORPUS_NAMES.items() if self.loaded[code]]
+        print(f"--- Retrieval sidecar listening on {path} (corpora: {', '.join(served)}; "
+              f"batch window {BATCH_WINDOW_MS:g} ms, max batch {MAX_BATCH}) ---")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if os.path.exists(path):
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve batched embed + FAISS search to local web workers.")
+    parser.add_argument("--socket", default=SIDECAR_SOCKET)
+    parser.add_argument("--corpora", nargs="+", choices=list(CORPUS_NAMES.values()), default=list(CORPUS_NAMES.values()))
+    args = parser.parse_args()
+
+    # One daemon per host: its batches get all the cores, whatever WEB_CONCURRENCY says
+    configure_runtime(workers=1)
+    sidecar = RetrievalSidecar(args.corpora)
+    try:
+        asyncio.run(sidecar.serve(args.socket))
+    except KeyboardInterrupt:
+        print(f"--- Retrieval sidecar stopped: {sidecar.stats} ---")
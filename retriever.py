@@ -1,8 +1,14 @@
 import os
 import pickle
-import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from metrics import span
+from knowledge_store import VersionedRef, content_version, watch
+from retrieval_sidecar import RETRIEVAL_MODE, CORPUS_RAG, SidecarError, get_sidecar_client
+from topic_neighbors import lookup_neighbors
+from runtime_config import apply_thread_budget
+
+# faiss and sentence-transformers are imported where they are used: with
+# RETRIEVAL_MODE=sidecar the web worker never loads them (retrieval_sidecar.py does).
 
 # --- Configuration (Must match data_processor.py) ---
 INDEX_FILE = "faiss_index.bin"
@@ -10,51 +16,77 @@ CHUNKS_FILE = "text_chunks.pkl"
 MODEL_NAME = 'all-MiniLM-L6-v2' 
 K = 5 # Default number of top results to retrieve
 
+
+def load_index_artifacts(paths):
+    """Loads (faiss index, text chunks) as one version; they must describe the same corpus."""
+    import faiss
+
+    index_path, chunks_path = paths
+    index = faiss.read_index(index_path)
+    with open(chunks_path, 'rb') as f:
+        text_chunks = pickle.load(f)
+    if index.ntotal != len(text_chunks):
+        raise ValueError(f"index has {index.ntotal} vectors but there are {len(text_chunks)} chunks (mid-rebuild?)")
+    return index, text_chunks
+
+
 class RAGRetriever:
     """
     A class to handle loading the FAISS index and performing vector search 
     to retrieve relevant text chunks for a given query.
     """
-    def __init__(self):
-        self.index = None
-        self.text_chunks = None
+    def __init__(self, use_sidecar: bool = RETRIEVAL_MODE == "sidecar"):
+        self.artifacts = None  # VersionedRef of (index, text_chunks), hot-reloaded by a watcher
         self.model = None
         self.is_ready = False
+        self.sidecar = None
+        if use_sidecar:
+            # Thin client: the sidecar owns the index (and reloads it); nothing to load here
+            self.sidecar = get_sidecar_client()
+            self.is_ready = self.sidecar.ping()
+            print(f"Retriever uses the retrieval sidecar at {self.sidecar.path} "
+                  f"({'ready' if self.is_ready else 'NOT reachable'}).")
+            return
         self._load_components()
+        if self.is_ready:
+            watch("faiss_index", [INDEX_FILE, CHUNKS_FILE], load_index_artifacts, self.artifacts)
+
+    @property
+    def index(self):
+        return self.artifacts.get()[0] if self.artifacts else None
+
+    @property
+    def text_chunks(self):
+        return self.artifacts.get()[1] if self.artifacts else None
 
     def _load_components(self):
         """Loads the FAISS index, text chunks, and the Sentence Transformer model."""
         
         print("--- RAG Retriever: Loading Components ---")
         
-        # 1. Load FAISS Index
+        # 1. Check the FAISS Index and Text Chunks exist
         if not os.path.exists(INDEX_FILE):
             print(f"ERROR: FAISS index file '{INDEX_FILE}' not found. Please run data_processor.py first.")
             return
 
-        try:
-            self.index = faiss.read_index(INDEX_FILE)
-            print(f"Loaded FAISS index with {self.index.ntotal} vectors.")
-        except Exception as e:
-            print(f"Error loading FAISS index: {e}")
-            return
-
-        # 2. Load Text Chunks
         if not os.path.exists(CHUNKS_FILE):
             print(f"ERROR: Text chunks file '{CHUNKS_FILE}' not found. Please run data_processor.py first.")
             return
 
+        # 2. Load both as one version
         try:
-            with open(CHUNKS_FILE, 'rb') as f:
-                self.text_chunks = pickle.load(f)
-            print(f"Loaded {len(self.text_chunks)} text chunks.")
+            paths = [INDEX_FILE, CHUNKS_FILE]
+            self.artifacts = VersionedRef(load_index_artifacts(paths), content_version(paths))
+            print(f"Loaded FAISS index with {self.index.ntotal} vectors and {len(self.text_chunks)} text chunks.")
         except Exception as e:
-            print(f"Error loading text chunks: {e}")
+            print(f"Error loading FAISS index / text chunks: {e}")
             return
 
         # 3. Load Embedding Model
         try:
+            from sentence_transformers import SentenceTransformer
             self.model = SentenceTransformer(MODEL_NAME)
+            apply_thread_budget()  # torch and faiss are loaded now
             self.is_ready = True
             print("Retriever is initialized and ready.")
         except Exception as e:
@@ -66,23 +98,47 @@ class RAGRetriever:
         """
         Takes a user query and finds the top-k most relevant text chunks.
         """
+        hits, _ = self.retrieve_scored(query, k)
+        return [text for _, text in hits]
+
+    def retrieve_scored(self, query: str, k: int = K) -> tuple[list[tuple[float, str]], str | None]:
+        """
+        ([(L2 distance, chunk text)] nearest first, artifact version). The version
+        is None when the sidecar owns the index (it is not known here).
+        """
         if not self.is_ready:
             print("Retriever is not ready. Aborting retrieval.")
-            return []
+            return [], None
+
+        if self.sidecar:
+            try:
+                return self.sidecar.search(CORPUS_RAG, query, k), None
+            except SidecarError as e:
+                print(f"Retrieval sidecar error: {e}")
+                return [], None
+
+        # One artifact version for the whole search, even if a reload swaps it meanwhile
+        (index, text_chunks), version = self.artifacts.get_versioned()
+
+        # Curriculum names (e.g. the selected topic) have precomputed neighbors: no embedding
+        known = lookup_neighbors("rag", query, k, version)
+        if known is not None:
+            return [(score, text_chunks[idx]) for idx, score in known if idx < len(text_chunks)], version
 
         # 1. Convert the query into a vector (embedding)
-        query_embedding = self.model.encode(query, convert_to_numpy=True)
-        query_embedding = np.array([query_embedding]).astype('float32') # FAISS requires a 2D array
+        with span("embed"):
+            query_embedding = self.model.encode(query, convert_to_numpy=True)
+            query_embedding = np.array([query_embedding]).astype('float32') # FAISS requires a 2D array
 
         # 2. Perform the FAISS search: D=distances, I=indices
-        D, I = self.index.search(query_embedding, k)
+        with span("faiss_search"):
+            D, I = index.search(query_embedding, k)
         
-        # 3. Get the corresponding text chunks
-        top_k_indices = I[0]
+        # 3. Get the corresponding text chunks (with their distances, for the relevance gate)
         # Filter indices to ensure they are within the bounds of text_chunks list
-        retrieved_chunks = [self.text_chunks[idx] for idx in top_k_indices if 0 <= idx < len(self.text_chunks)]
+        retrieved = [(float(d), text_chunks[idx]) for d, idx in zip(D[0], I[0]) if 0 <= idx < len(text_chunks)]
 
-        return retrieved_chunks
+        return retrieved, version
 
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+import os
+import sys
+import threading
+
+# --------------------------------------------------
+# CPU THREAD BUDGET (TORCH / FAISS / BLAS / POOLS)
+# --------------------------------------------------
+# torch intra-op, FAISS (OpenMP) and BLAS each start one thread per core in
+# every process. With WEB_CONCURRENCY uvicorn workers each serving concurrent
+# retrieve_context calls, workers x requests x cores threads compete for the
+# same cores and most of the time goes to context switches. Every process
+# instead takes its share of the cores (cores // workers) and spends it
+# according to the profile:
+#
+#   latency     one query at a time gets the whole share (torch/FAISS threads =
+#               share): lowest per-request latency at low concurrency
+#   throughput  single-threaded ops (1 thread each), concurrency comes from
+#               parallel requests: best aggregate QPS under load
+#
+# CPU-bound pools (the sharded retriever's fan-out) get the share in both
+# profiles; LLM/IO pools (grading, prefetch) are not CPU-bound and keep their
+# own sizes. TORCH_THREADS / FAISS_THREADS / POOL_THREADS override single values.
+#
+# Call configure_runtime() at process start, before torch/faiss/numpy are
+# imported (the OpenMP/BLAS pools read OMP_NUM_THREADS & co. when they load),
+# and apply_thread_budget() after loading a model or index (idempotent).
+
+RUNTIME_PROFILE = os.getenv("RUNTIME_PROFILE", "latency")   # latency | throughput
+WEB_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))         # uvicorn --workers default; export it with --workers
+PROFILES = ("latency", "throughput")
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def cpu_count() -> int:
+    """Cores this process may run on (affinity / container cpusets), not the host total."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def thread_budget(profile: str = RUNTIME_PROFILE, cores: int | None = None, workers: int = WEB_WORKERS) -> dict:
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown RUNTIME_PROFILE '{profile}' (expected one of {', '.join(PROFILES)})")
+    cores = cores or cpu_count()
+    share = max(1, cores // max(1, workers))
+    compute = share if profile == "latency" else 1
+    return {
+        "profile": profile,
+        "cores": cores,
+        "workers": workers,
+        "torch_threads": int(os.getenv("TORCH_THREADS", compute)),
+        "faiss_threads": int(os.getenv("FAISS_THREADS", compute)),
+        "pool_threads": int(os.getenv("POOL_THREADS", share)),
+    }
+
+
+_budget = None
+_applied = set()    # libraries already configured in this process
+_lock = threading.Lock()
+
+
+def configure_runtime(profile: str = RUNTIME_PROFILE, workers: int = WEB_WORKERS) -> dict:
+    """Fixes this process's budget (first call wins) and exports the OpenMP/BLAS thread counts."""
+    global _budget
+    with _lock:
+        if _budget is None:
+            _budget = thread_budget(profile, workers=workers)
+            for var in THREAD_ENV_VARS:
+                os.environ.setdefault(var, str(_budget["faiss_threads"]))
+            print(f"Thread budget ({_budget['profile']}): {_budget['cores']} cores / {_budget['workers']} workers -> "
+                  f"torch {_budget['torch_threads']}, faiss {_budget['faiss_threads']}, pools {_budget['pool_threads']}")
+    return _budget
+
+
+def get_thread_budget() -> dict:
+    return _budget or configure_runtime()
+
+
+def apply_thread_budget() -> dict:
+    """Sizes the thread pools of torch and faiss if they are loaded (already imported) in this process."""
+    budget = get_thread_budget()
+    with _lock:
+        torch = sys.modules.get("torch")
+        if torch is not None and "torch" not in _applied:
+            torch.set_num_threads(budget["torch_threads"])
+            try:
+                torch.set_num_interop_threads(1)   # inference never runs independent ops in parallel
+            except RuntimeError:
+                pass                               # only settable before the first parallel op
+            _applied.add("torch")
+        faiss = sys.modules.get("faiss")
+        if faiss is not None and "faiss" not in _applied and hasattr(faiss, "omp_set_num_threads"):
+            faiss.omp_set_num_threads(budget["faiss_threads"])
+            _applied.add("faiss")
+    return budget
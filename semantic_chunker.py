@@ -0,0 +1,204 @@
+import os
+import re
+import tiktoken
+
+# --- Configuration ---
+ENCODING_NAME = "cl100k_base"  # Same tokenizer as data_processor.split_text_into_chunks
+MAX_CHUNK_TOKENS = 512         # Hard cap per chunk (heading breadcrumb included)
+MIN_CHUNK_TOKENS = 64          # Sections smaller than this are merged with the next one
+MAX_HEADING_SHARE = 0.25       # Breadcrumbs longer than this share of the cap are shortened
+NUM_THREADS = os.cpu_count() or 4
+
+HEADING_RE = re.compile(r"^\s{0,3}(#{1,6})\s+(.+?)\s*#*\s*$")
+# Split after ., ! or ? when followed by whitespace and something that starts a new sentence
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[*A-Z0-9])")
+BLANK_LINE_RE = re.compile(r"\n\s*\n")
+
+
+# --- Structure Parsing ---
+def split_into_sections(text: str) -> list[dict]:
+    """
+    Splits a markdown-style document into sections.
+    Each section keeps its heading path (e.g. ["1. Foundations", "1.1 Linear Algebra"])
+    and the list of paragraphs (blocks separated by blank lines) below that heading.
+    """
+    sections = []
+    heading_path = []
+    paragraphs = []
+    current_lines = []
+
+    def flush_paragraph():
+        if current_lines:
+            paragraph = "\n".join(current_lines).strip()
+            if paragraph:
+                paragraphs.append(paragraph)
+            current_lines.clear()
+
+    def flush_section():
+        flush_paragraph()
+        if paragraphs:
+            sections.append({"heading_path": list(heading_path), "paragraphs": list(paragraphs)})
+            paragraphs.clear()
+
+    for line in text.splitlines():
+        match = HEADING_RE.match(line)
+        if match:
+            flush_section()
+            level = len(match.group(1))
+            # Keep only the ancestors of this heading
+            heading_path[:] = heading_path[:level - 1]
+            heading_path.extend([""] * (level - 1 - len(heading_path)))
+            heading_path.append(match.group(2))
+        elif not line.strip() or line.strip() == "---":
+            flush_paragraph()
+        else:
+            current_lines.append(line.rstrip())
+
+    flush_section()
+    return sections
+
+
+def split_into_sentences(paragraph: str) -> list[str]:
+    """Splits a paragraph into sentences. Bullet lists are split per line instead."""
+    lines = paragraph.splitlines()
+    if len(lines) > 1:
+        return [line for line in lines if line.strip()]
+    return [s for s in SENTENCE_RE.split(paragraph) if s.strip()]
+
+
+def format_heading(heading_path: list[str]) -> str:
+    """Breadcrumb prepended to every chunk so it stays self-describing."""
+    crumbs = [h for h in heading_path if h]
+    return " > ".join(crumbs)
+
+
+def shorten_heading(heading: str, encoding, budget: int) -> tuple[str, int]:
+    """Keeps the most specific crumbs that fit in `budget` tokens, cutting the last one if it alone is too long."""
+    crumbs = heading.split(" > ")
+    tokens = encoding.encode(heading)
+    while len(tokens) > budget and len(crumbs) > 1:
+        crumbs.pop(0)
+        tokens = encoding.encode(" > ".join(crumbs))
+    text = encoding.decode(tokens[:budget])
+    n_tokens = len(encoding.encode(text))
+    while n_tokens > budget:   # a cut inside a multi-byte character can re-encode longer
+        text = text[:-1]
+        n_tokens = len(encoding.encode(text))
+    return text, n_tokens
+
+
+# --- Chunk Packing ---
+def _hard_split(text: str, encoding, max_tokens: int) -> list[str]:
+    """Last resort for a single sentence longer than the cap: cut on token boundaries."""
+    tokens = encoding.encode(text)
+    return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+
+def _pack_units(units: list[tuple[str, int]], heading: str, heading_tokens: int,
+                max_tokens: int) -> list[dict]:
+    """Greedily packs (text, n_tokens) units into chunks that stay under max_tokens."""
+    chunks = []
+    current, current_tokens = [], heading_tokens
+
+    for text, n_tokens in units:
+        if current and current_tokens + n_tokens > max_tokens:
+            chunks.append({"heading": heading, "units": current, "n_tokens": current_tokens})
+            current, current_tokens = [], heading_tokens
+        current.append(text)
+        current_tokens += n_tokens
+
+    if current:
+        chunks.append({"heading": heading, "units": current, "n_tokens": current_tokens})
+    return chunks
+
+
+def _render(chunk: dict) -> dict:
+    body = "\n\n".join(chunk["units"])
+    text = f"{chunk['heading']}\n\n{body}" if chunk["heading"] else body
+    return {"text": text, "heading": chunk["heading"], "n_tokens": chunk["n_tokens"]}
+
+
+def chunk_documents(documents: list[str], max_tokens: int = MAX_CHUNK_TOKENS,
+                    min_tokens: int = MIN_CHUNK_TOKENS, num_threads: int = NUM_THREADS) -> list[list[dict]]:
+    """
+    Structure-aware chunking for a batch of documents.
+
+    Headings, paragraphs and sentences are respected: a chunk never starts or ends
+    mid-sentence, never spans two top-level sections, and carries its heading breadcrumb
+    (shortened to MAX_HEADING_SHARE of the cap, so the body always has room).
+    All paragraphs of all documents are tokenized in one parallel `encode_batch` call.
+
+    Returns one list of chunk dicts ({"text", "heading", "n_tokens"}) per document.
+    """
+    encoding = tiktoken.get_encoding(ENCODING_NAME)
+    parsed = [split_into_sections(doc) for doc in documents]
+
+    # 1. Tokenize every heading and paragraph of every document in parallel
+    flat = []
+    for sections in parsed:
+        for section in sections:
+            flat.append(format_heading(section["heading_path"]))
+            flat.extend(section["paragraphs"])
+    counts = iter(len(t) for t in encoding.encode_batch(flat, num_threads=num_threads))
+
+    heading_budget = max(1, int(max_tokens * MAX_HEADING_SHARE))
+    results = []
+    for sections in parsed:
+        doc_chunks = []
+        previous_top = None
+        for section in sections:
+            heading = format_heading(section["heading_path"])
+            heading_tokens = next(counts)
+            if heading_tokens > heading_budget:
+                heading, heading_tokens = shorten_heading(heading, encoding, heading_budget)
+            top = next((h for h in section["heading_path"] if h), "")   # before shortening
+
+            # 2. Paragraph units; oversized paragraphs fall back to sentences, then to tokens
+            units = []
+            for paragraph in section["paragraphs"]:
+                n_tokens = next(counts)
+                if heading_tokens + n_tokens <= max_tokens:
+                    units.append((paragraph, n_tokens))
+                    continue
+                for sentence in split_into_sentences(paragraph):
+                    sentence_tokens = len(encoding.encode(sentence))
+                    if heading_tokens + sentence_tokens <= max_tokens:
+                        units.append((sentence, sentence_tokens))
+                    else:
+                        for piece in _hard_split(sentence, encoding, max_tokens - heading_tokens):
+                            units.append((piece, len(encoding.encode(piece))))
+
+            section_chunks = _pack_units(units, heading, heading_tokens, max_tokens)
+
+            # 3. Merge a tiny trailing chunk into the next section of the same top-level parent
+            if doc_chunks:
+                previous = doc_chunks[-1]
+                first = section_chunks[0]
+                # previous["n_tokens"] includes its heading, which becomes a unit of the merged chunk;
+                # first["n_tokens"] includes the heading the merged chunk keeps
+                merged_tokens = previous["n_tokens"] + first["n_tokens"]
+                if (previous_top == top and previous["n_tokens"] < min_tokens
+                        and merged_tokens <= max_tokens):
+                    first["units"] = [h for h in [previous["heading"]] if h] + previous["units"] + first["units"]
+                    first["n_tokens"] = merged_tokens
+                    doc_chunks.pop()
+
+            doc_chunks.extend(section_chunks)
+            previous_top = top
+
+        results.append([_render(c) for c in doc_chunks])
+    return results
+
+
+def chunk_text(text: str, max_tokens: int = MAX_CHUNK_TOKENS) -> list[str]:
+    """Convenience wrapper returning plain chunk strings for a single document."""
+    return [c["text"] for c in chunk_documents([text], max_tokens=max_tokens)[0]]
+
+
+if __name__ == "__main__":
+    with open("Machine-learning-all-topics.txt", "r", encoding="utf-8") as f:
+        chunks = chunk_documents([f.read()])[0]
+
+    print(f"Generated {len(chunks)} chunks.")
+    for chunk in chunks[:3]:
+        print(f"[{chunk['n_tokens']} tokens] {chunk['text'][:200]}\n{'=' * 30}")
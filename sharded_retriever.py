@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import heapq
+import pickle
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from metrics import span
+from knowledge_store import VersionedRef, content_version, watch
+from semantic_chunker import chunk_documents
+from topic_matcher import tokenize
+from dedup import DEDUP_ENABLED, dedup_chunks
+from runtime_config import apply_thread_budget
+
+# --------------------------------------------------
+# SHARDED MULTI-CORPUS RETRIEVAL
+# --------------------------------------------------
+# One FAISS index per corpus, each built, stored and hot-reloaded on its own,
+# so adding a corpus never rebuilds or slows the others. A query is embedded
+# once, routed to the relevant shards and searched on all of them in parallel
+# threads (FAISS releases the GIL during search). Cosine scores are not
+# comparable across corpora (a dense API reference scores higher than prose
+# notes for everything), so each shard's scores are z-normalized with the
+# score distribution measured at build time before the top-k are merged.
+#
+#   shards/<name>/index.faiss   IndexFlatIP over normalized embeddings
+#   shards/<name>/chunks.pkl    [{"text", "heading", "shard"}]
+#   shards/<name>/meta.json     model, size, calibration {"mean", "std"}
+
+SHARD_DIR = os.getenv("SHARD_DIR", "shards")
+MODEL_NAME = 'all-MiniLM-L6-v2'   # must match the query encoder
+MAX_CHUNK_TOKENS = 256
+CALIBRATION_QUERIES = 200         # own chunks used as queries to measure the score distribution
+CALIBRATION_K = 5
+K = 5
+
+# routes: query/topic tokens that send a query to the shard; [] = general shard, always searched.
+# The .clean.txt sources are produced by generate_knowledge_chunks.py.
+SHARDS = {
+    "ml_topics": {
+        "source": "Machine-learning-all-topics.txt",
+        "routes": [],
+    },
+    "curriculum": {
+        "source": "expert_knowledge.json",
+        "routes": [],
+    },
+    "sklearn_user_guide": {
+        "source": os.path.join("knowledge_processed", "user_guide.html.clean.txt"),
+        "routes": ["sklearn", "scikit", "estimator", "pipeline", "hyperparameter", "cross", "validation",
+                   "preprocessing", "api", "fit", "predict"],
+    },
+    "sklearn_classification": {
+        "source": os.path.join("knowledge_processed", "classification.html.clean.txt"),
+        "routes": ["classification", "classifier", "svm", "logistic", "bayes", "tree", "forest", "neighbors",
+                   "knn", "boosting", "precision", "recall"],
+    },
+    "cs229_notes": {
+        "source": os.path.join("knowledge_processed", "cs229-notes1.pdf.clean.txt"),
+        "routes": ["regression", "squares", "gradient", "descent", "likelihood", "logistic", "newton",
+                   "glm", "exponential", "perceptron", "probabilistic"],
+    },
+}
+
+
+def shard_paths(name: str) -> list[str]:
+    base = os.path.join(SHARD_DIR, name)
+    return [os.path.join(base, "index.faiss"), os.path.join(base, "chunks.pkl"), os.path.join(base, "meta.json")]
+
+
+# --------------------------------------------------
+# BUILD (python sharded_retriever.py --build [names])
+# --------------------------------------------------
+def read_corpus(name: str) -> list[dict]:
+    """Chunks of one corpus as [{"text", "heading", "shard"}]."""
+    source = SHARDS[name]["source"]
+    if source.endswith(".json"):
+        with open(source, encoding="utf-8") as f:
+            knowledge = json.load(f)
+        return [{"text": c["explanation"], "heading": f"{c['topic']} > {c['subtopic']}", "shard": name}
+                for c in knowledge]
+
+    with open(source, encoding="utf-8") as f:
+        text = f.read()
+    return [{"text": c["text"], "heading": c["heading"], "shard": name}
+            for c in chunk_documents([text], max_tokens=MAX_CHUNK_TOKENS)[0]]
+
+
+def calibrate(index, embeddings: np.ndarray, seed: int = 7) -> dict:
+    """Mean/std of the top-k scores a typical query gets on this shard (own chunks as queries, self-match skipped)."""
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(embeddings), size=min(CALIBRATION_QUERIES, len(embeddings)), replace=False)
+    scores, _ = index.search(embeddings[sample], min(CALIBRATION_K + 1, index.ntotal))
+    scores = scores[:, 1:] if scores.shape[1] > 1 else scores
+    return {"mean": float(scores.mean()), "std": float(max(scores.std(), 1e-6))}
+
+
+def build_shard(name: str, model: SentenceTransformer):
+    chunks, dedup_report = dedup_chunks(read_corpus(name)) if DEDUP_ENABLED else (read_corpus(name), None)
+    start = time.perf_counter()
+    embeddings = model.encode([c["text"] for c in chunks], convert_to_numpy=True, batch_size=64).astype('float32')
+    faiss.normalize_L2(embeddings)
+    index = faiss.IndexFlatIP(embeddings.shape[1])
+    index.add(embeddings)
+
+    meta = {
+        "model": MODEL_NAME,
+        "vectors": index.ntotal,
+        "source": SHARDS[name]["source"],
+        "source_version": content_version([SHARDS[name]["source"]]),
+        "calibration": calibrate(index, embeddings),
+        "dedup": dedup_report,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+    # Temp files + rename: a running ShardedRetriever reloads the shard without seeing partial files
+    index_path, chunks_path, meta_path = shard_paths(name)
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    faiss.write_index(index, index_path + ".tmp")
+    with open(chunks_path + ".tmp", "wb") as f:
+        pickle.dump(chunks, f)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    for path in (index_path, chunks_path, meta_path):
+        os.replace(path + ".tmp", path)
+
+    print(f"✅ {name}: {index.ntotal} chunks in {time.perf_counter() - start:.1f}s "
+          f"(score mean={meta['calibration']['mean']:.3f} std={meta['calibration']['std']:.3f})")
+
+
+# --------------------------------------------------
+# SERVE
+# --------------------------------------------------
+class Shard:
+    def __init__(self, name, index, chunks, meta):
+        self.name = name
+        self.index = index
+        self.chunks = chunks
+        self.meta = meta
+        self.mean = meta["calibration"]["mean"]
+        self.std = meta["calibration"]["std"]
+
+    def search(self, query_embedding: np.ndarray, k: int) -> list[tuple[float, float, dict]]:
+        """[(normalized score, raw cosine, chunk)] for one query."""
+        with span("faiss_search"):
+            scores, indices = self.index.search(query_embedding, min(k, self.index.ntotal))
+        return [((float(s) - self.mean) / self.std, float(s), self.chunks[i])
+                for s, i in zip(scores[0], indices[0]) if 0 <= i < len(self.chunks)]
+
+
+def load_shard(paths) -> Shard:
+    index_path, chunks_path, meta_path = paths
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    index = faiss.read_index(index_path)
+    with open(chunks_path, "rb") as f:
+        chunks = pickle.load(f)
+    if not index.ntotal == len(chunks) == meta["vectors"]:
+        raise ValueError(f"shard files disagree: {index.ntotal} vectors, {len(chunks)} chunks, meta {meta['vectors']}")
+    return Shard(os.path.basename(os.path.dirname(index_path)), index, chunks, meta)
+
+
+class ShardedRetriever:
+    """
+    Drop-in for RAGRetriever (retrieve_context returns chunk texts) over every built shard.
+    search() returns the merged hits with their shard and scores.
+    """
+
+    def __init__(self, names: list[str] | None = None, model: SentenceTransformer | None = None):
+        self.model = model
+        self.shards = {}   # name -> VersionedRef[Shard]
+        self.routes = {}   # name -> set of route tokens
+        for name in names or SHARDS:
+            paths = shard_paths(name)
+            if not all(os.path.exists(p) for p in paths):
+                print(f"Shard '{name}' is not built (python sharded_retriever.py --build {name}); skipping.")
+                continue
+            self.shards[name] = VersionedRef(load_shard(paths), content_version(paths))
+            watch(f"shard_{name}", paths, load_shard, self.shards[name])
+            self.routes[name] = set(SHARDS[name]["routes"])
+
+        if self.shards and self.model is None:
+            self.model = SentenceTransformer(MODEL_NAME)
+        budget = apply_thread_budget()
+        self.is_ready = bool(self.shards)
+        # Shard searches are CPU-bound: fan out over at most this process's core share
+        self._pool = ThreadPoolExecutor(max_workers=max(1, min(len(self.shards), budget["pool_threads"])),
+                                        thread_name_prefix="shard")
+        print(f"Sharded retriever ready: {', '.join(f'{n} ({r.get().index.ntotal})' for n, r in self.shards.items())}")
+
+    def route(self, query: str, topic: str | None = None) -> list[str]:
+        """General shards plus every shard whose route tokens appear in the query or topic."""
+        tokens = set(tokenize(query)) | set(tokenize(topic or ""))
+        return [name for name in self.shards if not self.routes[name] or tokens & self.routes[name]]
+
+    def search(self, query: str, k: int = K, topic: str | None = None, shards: list[str] | None = None) -> list[dict]:
+        names = shards or self.route(query, topic)
+        with span("embed"):
+            query_embedding = self.model.encode([query], convert_to_numpy=True).astype('float32')
+            faiss.normalize_L2(query_embedding)
+
+        # One version per shard for the whole query, searched in parallel
+        targets = [self.shards[name].get() for name in names if name in self.shards]
+        futures = [self._pool.submit(shard.search, query_embedding, k) for shard in targets]
+        hits = [hit for future in futures for hit in future.result()]
+
+        return [{**chunk, "score": round(norm, 4), "raw_score": round(raw, 4)}
+                for norm, raw, chunk in heapq.nlargest(k, hits, key=lambda h: h[0])]
+
+    def retrieve_context(self, query: str, k: int = K, topic: str | None = None) -> list[str]:
+        if not self.is_ready:
+            print("Sharded retriever has no shards. Aborting retrieval.")
+            return []
+        return [hit["text"] for hit in self.search(query, k, topic)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the per-corpus FAISS shards.")
+    parser.add_argument("--build", nargs="*", metavar="SHARD", help="Build these shards (all when none given).")
+    parser.add_argument("--query", help="Search the built shards.")
+    parser.add_argument("--topic", help="Optional topic used for routing.")
+    parser.add_argument("-k", type=int, default=K)
+    args = parser.parse_args()
+
+    if args.build is not None:
+        model = SentenceTransformer(MODEL_NAME)
+        for name in args.build or SHARDS:
+            if not os.path.exists(SHARDS[name]["source"]):
+                print(f"Skipping {name}: {SHARDS[name]['source']} not found (run generate_knowledge_chunks.py).")
+                continue
+            build_shard(name, model)
+
+    if args.query:
+        retriever = ShardedRetriever()
+        print(f"Routed to: {retriever.route(args.query, args.topic)}")
+        for hit in retriever.search(args.query, args.k, args.topic):
+            print(f"[{hit['shard']}] z={hit['score']} cos={hit['raw_score']} {hit['heading']}\n   {hit['text'][:160]}")
@@ -0,0 +1,28 @@
+import numpy as np
+
+from member3.learner_state import ema
+from member3.score_update import update_score
+
+
+def reference_update(old_score: float, eval_score: float) -> float:
+    # The original scalar update (before the vectorized engine)
+    return round(0.7 * old_score + 0.3 * eval_score, 3)
+
+
+def test_update_score_matches_reference_on_grid():
+    olds = [i / 1000 for i in range(1001)]
+    evals = [i / 100 for i in range(101)]
+    mismatches = [(o, e) for o in olds for e in evals if update_score(o, e) != reference_update(o, e)]
+    assert not mismatches, f"{len(mismatches)} mismatches, e.g. {mismatches[:5]}"
+
+
+def test_vectorized_ema_matches_reference_on_grid():
+    olds, evals = np.meshgrid(np.arange(1001) / 1000, np.arange(101) / 100)
+    expected = np.array([reference_update(o, e) for o, e in zip(olds.ravel().tolist(), evals.ravel().tolist())])
+    assert np.array_equal(ema(olds.ravel(), evals.ravel()), expected)
+
+
+if __name__ == "__main__":
+    test_update_score_matches_reference_on_grid()
+    test_vectorized_ema_matches_reference_on_grid()
+    print("update_score / ema match the original rounding on the 1001 x 101 grid.")
@@ -0,0 +1,120 @@
+import os
+import re
+from collections import deque
+
+import numpy as np
+
+from runtime_config import apply_thread_budget
+
+# --------------------------------------------------
+# TOPIC MATCHER (TOKEN-LEVEL AHO-CORASICK)
+# --------------------------------------------------
+# Finds which curriculum subtopic a free-text answer names. Subtopic ids and
+# answers are normalized to lowercase alphanumeric tokens, so
+# "linear_algebra_basics", "Linear Algebra Basics" and "I'd like linear-algebra
+# basics please" all match. The automaton is built once; a lookup is one pass
+# over the answer's tokens and returns the longest match (the earliest one on
+# ties), so overlapping names like "optimization_theory" vs "optimization" are
+# unambiguous.
+#
+# Optional fuzzy fallback (TOPIC_MATCH_FUZZY=1): when nothing matches exactly,
+# the answer is embedded with the retriever's sentence-transformer and compared
+# with the subtopic names by cosine similarity.
+
+TOPIC_MATCH_FUZZY = os.getenv("TOPIC_MATCH_FUZZY", "0") == "1"
+FUZZY_MODEL_NAME = "all-MiniLM-L6-v2"
+FUZZY_THRESHOLD = float(os.getenv("TOPIC_MATCH_FUZZY_THRESHOLD", "0.55"))
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+class TopicMatcher:
+    def __init__(self, subtopics: list[str], fuzzy: bool = TOPIC_MATCH_FUZZY):
+        self.subtopics = list(subtopics)
+        self.fuzzy = fuzzy
+        self._exact = {}          # normalized full name -> subtopic
+        self._goto = [{}]         # node -> {token: node}
+        self._fail = [0]
+        self._best = [None]       # node -> (n_tokens, subtopic) of the longest name ending here
+        self._embeddings = None   # lazily built for the fuzzy fallback
+        self._model = None
+
+        for subtopic in self.subtopics:
+            tokens = tokenize(subtopic)
+            if tokens:
+                self._exact.setdefault(" ".join(tokens), subtopic)
+                self._add(tokens, subtopic)
+        self._link()
+
+    # --- build ---
+    def _add(self, tokens, subtopic):
+        node = 0
+        for token in tokens:
+            nxt = self._goto[node].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][token] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            node = nxt
+        if self._best[node] is None:
+            self._best[node] = (len(tokens), subtopic)
+
+    def _link(self):
+        # BFS: failure links point at the longest proper suffix that is also a trie path
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(token, 0)
+                if self._best[child] is None:
+                    self._best[child] = self._best[self._fail[child]]
+                queue.append(child)
+
+    # --- lookup ---
+    def exact(self, text: str) -> str | None:
+        """The subtopic when the whole answer is a subtopic name (e.g. a clicked option)."""
+        return self._exact.get(" ".join(tokenize(text)))
+
+    def match(self, text: str) -> str | None:
+        """Longest subtopic named anywhere in the answer, else the fuzzy pick (if enabled), else None."""
+        node, best = 0, None
+        for token in tokenize(text):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+            found = self._best[node]
+            if found and (best is None or found[0] > best[0]):
+                best = found
+        if best:
+            return best[1]
+        return self.fuzzy_match(text) if self.fuzzy else None
+
+    def fuzzy_match(self, text: str) -> str | None:
+        if self._embeddings is None and not self._load_embeddings():
+            return None
+        query = self._model.encode([text], normalize_embeddings=True)[0]
+        scores = self._embeddings @ query
+        best = int(np.argmax(scores))
+        return self.subtopics[best] if scores[best] >= FUZZY_THRESHOLD else None
+
+    def _load_embeddings(self) -> bool:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            print("Topic matcher: sentence-transformers is not installed, fuzzy matching disabled.")
+            self.fuzzy = False
+            return False
+        self._model = SentenceTransformer(FUZZY_MODEL_NAME)
+        apply_thread_budget()
+        names = [" ".join(tokenize(s)) for s in self.subtopics]
+        self._embeddings = self._model.encode(names, normalize_embeddings=True)
+        return True
@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import time
+import argparse
+import threading
+
+import numpy as np
+
+from knowledge_store import VersionedRef, content_version, watch
+from metrics import record_cache
+from topic_matcher import tokenize
+
+# --------------------------------------------------
+# PRECOMPUTED SUBTOPIC NEIGHBORS
+# --------------------------------------------------
+# Most retrieval queries are curriculum names: main_app's current_topic after
+# topic selection, or a subtopic id handed to retrieve_context_by_difficulty.
+# This offline step embeds every topic/subtopic name of expert_knowledge.json
+# and member2/curriculum_blueprint.json once and stores its top-k neighbors in
+# each index. At query time a known name is one dictionary lookup; only
+# free-form queries are embedded.
+#
+# Names are matched on their normalized tokens ("linear_algebra_basics" ==
+# "Linear Algebra Basics"). Each corpus's rows are stamped with the content
+# version of the artifacts they were computed against; after a rebuild or hot
+# reload of an index the table no longer matches and lookups fall back to the
+# model until the table is rebuilt (python topic_neighbors.py). A rebuilt
+# topic_neighbors.npz is picked up by a knowledge_store watcher, no restart needed.
+#
+#   topic_neighbors.npz   keys (names), <corpus>_indices / _scores (n x k), <corpus>_version
+
+NEIGHBOR_TABLE_FILE = os.getenv("NEIGHBOR_TABLE_FILE", "topic_neighbors.npz")
+NEIGHBOR_K = 8                     # neighbors stored per name; larger k falls back to the model
+MODEL_NAME = 'all-MiniLM-L6-v2'    # must match the retrievers' query encoder
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+KNOWLEDGE_PATH = os.path.join(BASE_DIR, "expert_knowledge.json")
+BLUEPRINT_PATH = os.path.join(BASE_DIR, "member2", "curriculum_blueprint.json")
+
+CITE_RE = re.compile(r"\[cite_start\]|\s*\[cite:[^\]]*\]")
+
+
+def normalize_name(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+def load_blueprint(path: str = BLUEPRINT_PATH) -> list[dict]:
+    """curriculum_blueprint.json still carries [cite_start]/[cite: N] markers from its source; strip them first."""
+    with open(path, encoding="utf-8") as f:
+        return json.loads(CITE_RE.sub("", f.read()))
+
+
+def curriculum_names() -> list[str]:
+    """Normalized topic and subtopic names, deduplicated, in curriculum order."""
+    names = []
+    for path, loader in ((KNOWLEDGE_PATH, None), (BLUEPRINT_PATH, load_blueprint)):
+        if not os.path.exists(path):
+            continue
+        if loader:
+            chunks = loader(path)
+        else:
+            with open(path, encoding="utf-8") as f:
+                chunks = json.load(f)
+        for chunk in chunks:
+            names.extend(normalize_name(chunk[field]) for field in ("subtopic", "topic") if chunk.get(field))
+    return list(dict.fromkeys(n for n in names if n))
+
+
+# --------------------------------------------------
+# LOOKUP
+# --------------------------------------------------
+class NeighborTable:
+    def __init__(self, arrays):
+        self.rows = {key: i for i, key in enumerate(arrays["keys"].tolist())}
+        self.corpora = {}   # corpus -> (indices, scores, version)
+        for name in arrays.files:
+            if name.endswith("_indices"):
+                corpus = name[:-len("_indices")]
+                self.corpora[corpus] = (arrays[name], arrays[f"{corpus}_scores"], str(arrays[f"{corpus}_version"]))
+
+    def lookup(self, corpus: str, query: str, k: int, version: str) -> list[tuple[int, float]] | None:
+        """[(row in the corpus, score)] for a known name, None when the model has to run."""
+        entry = self.corpora.get(corpus)
+        if entry is None or entry[2] != version:
+            return None
+        row = self.rows.get(normalize_name(query))
+        indices, scores, _ = entry
+        if row is None or k > indices.shape[1]:
+            return None
+        return [(int(i), float(s)) for i, s in zip(indices[row, :k], scores[row, :k]) if i >= 0]
+
+
+def load_table(paths: list[str]) -> NeighborTable:
+    with np.load(paths[0], allow_pickle=False) as arrays:
+        table = NeighborTable(arrays)
+    print(f"Neighbor table: {len(table.rows)} curriculum names x {', '.join(table.corpora)}")
+    return table
+
+
+_table = None       # VersionedRef[NeighborTable | None], reloaded when the file is rebuilt
+_table_lock = threading.Lock()
+
+
+def get_neighbor_table() -> NeighborTable | None:
+    """Process-wide table, or None when it has not been built."""
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                paths = [NEIGHBOR_TABLE_FILE]
+                if os.path.exists(NEIGHBOR_TABLE_FILE):
+                    ref = VersionedRef(load_table(paths), content_version(paths))
+                else:
+                    ref = VersionedRef(None, "")   # any built file differs: loaded once it appears
+                watch("topic_neighbors", paths, load_table, ref)
+                _table = ref
+    return _table.get()
+
+
+def lookup_neighbors(corpus: str, query: str, k: int, version: str) -> list[tuple[int, float]] | None:
+    """Table lookup for the retrievers; records hits/misses as cache "topic_neighbors"."""
+    table = get_neighbor_table()
+    if table is None:
+        return None
+    hits = table.lookup(corpus, query, k, version)
+    record_cache("topic_neighbors", hits is not None)
+    return hits
+
+
+# --------------------------------------------------
+# BUILD (python topic_neighbors.py)
+# --------------------------------------------------
+def build_table(path: str = NEIGHBOR_TABLE_FILE, k: int = NEIGHBOR_K):
+    import faiss
+    from sentence_transformers import SentenceTransformer
+    from retriever import INDEX_FILE, CHUNKS_FILE, load_index_artifacts
+
+    start = time.perf_counter()
+    names = curriculum_names()
+    model = SentenceTransformer(MODEL_NAME)
+    embeddings = model.encode(names, convert_to_numpy=True, batch_size=64).astype('float32')
+    arrays = {"keys": np.array(names)}
+
+    # RAG corpus (faiss_index.bin: L2 distances over raw embeddings)
+    paths = [INDEX_FILE, CHUNKS_FILE]
+    if all(os.path.exists(p) for p in paths):
+        index, _ = load_index_artifacts(paths)
+        scores, indices = index.search(embeddings, min(k, index.ntotal))
+        arrays.update(rag_indices=indices.astype(np.int32), rag_scores=scores.astype(np.float32),
+                      rag_version=np.array(content_version(paths)))
+
+    # Curriculum (member2.step5_faiss_demo: cosine over normalized embeddings)
+    from member2.step5_faiss_demo import build_index
+    _, index = build_index([KNOWLEDGE_PATH])
+    normalized = embeddings.copy()
+    faiss.normalize_L2(normalized)
+    scores, indices = index.search(normalized, min(k, index.ntotal))
+    arrays.update(curriculum_indices=indices.astype(np.int32), curriculum_scores=scores.astype(np.float32),
+                  curriculum_version=np.array(content_version([KNOWLEDGE_PATH])))
+
+    with open(path + ".tmp", "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(path + ".tmp", path)
+    corpora = [n[:-len("_indices")] for n in arrays if n.endswith("_indices")]
+    print(f"✅ {len(names)} names x top-{k} neighbors in {', '.join(corpora)} "
+          f"({os.path.getsize(path) / 1024:.1f} KB, {time.perf_counter() - start:.1f}s) -> {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the top-k chunk neighbors of every curriculum name.")
+    parser.add_argument("--output", default=NEIGHBOR_TABLE_FILE)
+    parser.add_argument("-k", type=int, default=NEIGHBOR_K)
+    args = parser.parse_args()
+    build_table(args.output, args.k)
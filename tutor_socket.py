@@ -0,0 +1,106 @@
+import os
+import time
+import asyncio
+
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+
+import backend_controller
+from metrics import inc
+
+# --------------------------------------------------
+# PERSISTENT TUTOR SESSION CHANNEL (WEBSOCKET /ws/tutor)
+# --------------------------------------------------
+# One long-lived connection per learner session instead of a POST (and its
+# connection + headers) per turn, and a way for the server to speak first.
+# Every frame is a JSON object with a "type":
+#
+#   client -> server
+#     {"type": "turn", "id": n, "answer": str | null, "wait_for_grading": bool}
+#     {"type": "heartbeat"}
+#   server -> client
+#     {"type": "turn", "id": n, ...tutor_step result} same body as POST /api/tutor
+#     {"type": "score_update", "score_updates": [...], "pending_grades": n}
+#                                                    pushed as soon as a background grade is applied
+#     {"type": "heartbeat", "ts": float}             every WS_HEARTBEAT_SECONDS (keeps proxies from idling it out)
+#     {"type": "error", "id": n | null, "detail": str}  id null: the frame was not a JSON object
+#
+# Turns on one connection run one at a time, in order. The LLM client has no
+# streaming API yet, so the explanation arrives whole in the turn frame.
+# Clients that cannot open the socket keep using POST /api/tutor.
+
+WS_HEARTBEAT_SECONDS = float(os.getenv("WS_HEARTBEAT_SECONDS", "15"))
+CLIENT_TYPES = ("turn", "heartbeat")   # metric label values; anything else counts as "unknown"
+
+
+class TutorSession:
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self._send_lock = asyncio.Lock()   # turn, push and heartbeat tasks share one socket
+        self._updates = asyncio.Event()
+
+    async def send(self, message: dict):
+        async with self._send_lock:
+            await self.websocket.send_json(message)
+        inc("ws_messages_total", direction="out", type=message["type"])
+
+    async def push_score_updates(self):
+        """Sends grades as soon as the grading queue applies them."""
+        while True:
+            await self._updates.wait()
+            self._updates.clear()
+            updates = backend_controller.GRADING.drain_updates()
+            if updates:
+                await self.send({"type": "score_update", "score_updates": updates,
+                                 "pending_grades": backend_controller.GRADING.pending()})
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(WS_HEARTBEAT_SECONDS)
+            await self.send({"type": "heartbeat", "ts": time.time()})
+
+    async def turn(self, message: dict):
+        turn_id = message.get("id")
+        result = await run_in_threadpool(backend_controller.tutor_step, message.get("answer"),
+                                         bool(message.get("wait_for_grading", False)))
+        await self.send({"type": "turn", "id": turn_id, **result})
+
+    async def run(self):
+        await self.websocket.accept()
+        inc("ws_connections_total")
+        loop = asyncio.get_running_loop()
+
+        def notify():   # grading worker thread -> event loop
+            loop.call_soon_threadsafe(self._updates.set)
+
+        backend_controller.GRADING.add_listener(notify)
+        tasks = [asyncio.create_task(self.push_score_updates()), asyncio.create_task(self.heartbeat())]
+        try:
+            while True:
+                try:
+                    message = await self.websocket.receive_json()
+                except (ValueError, KeyError):   # not JSON, or a binary frame (no "text")
+                    message = None
+                if not isinstance(message, dict):
+                    inc("ws_messages_total", direction="in", type="malformed")
+                    await self.send({"type": "error", "id": None, "detail": "Frames must be JSON objects."})
+                    continue
+                kind = message.get("type")
+                inc("ws_messages_total", direction="in", type=kind if kind in CLIENT_TYPES else "unknown")
+                if kind == "turn":
+                    try:
+                        await self.turn(message)
+                    except WebSocketDisconnect:
+                        raise
+                    except Exception as e:
+                        print(f"WebSocket turn failed: {e}")
+                        await self.send({"type": "error", "id": message.get("id"), "detail": "Turn failed."})
+                elif kind != "heartbeat":
+                    await self.send({"type": "error", "id": message.get("id"), "detail": f"Unknown message type '{kind}'."})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            backend_controller.GRADING.remove_listener(notify)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
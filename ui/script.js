@@ -33,10 +33,79 @@ function addMessage(text, isUser = false) {
         top: messagesContainer.scrollHeight,
         behavior: 'smooth'
     });
+    return msgDiv;
+}
+
+// Persistent session channel: one WebSocket carries every turn, pushed score
+// updates and heartbeats. fetch('/api/tutor') is the fallback
+// when the socket cannot be opened.
+let socket = null;
+let socketSupported = true;  // false once the server refused the upgrade: stay on HTTP
+let nextTurnId = 0;
+const pendingTurns = new Map(); // turn id -> resolve
+
+function connectSocket() {
+    if (!socketSupported || !('WebSocket' in window)) return Promise.resolve(false);
+    return new Promise(resolve => {
+        const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+        const ws = new WebSocket(`${scheme}://${location.host}/ws/tutor`);
+        let opened = false;
+        ws.onopen = () => {
+            opened = true;
+            socket = ws;
+            resolve(true);
+        };
+        ws.onmessage = event => handleSocketMessage(JSON.parse(event.data));
+        ws.onclose = () => {
+            if (!opened) socketSupported = false;
+            if (socket === ws) socket = null;
+            // Turns in flight on this socket get no reply
+            for (const resolve of pendingTurns.values()) resolve(null);
+            pendingTurns.clear();
+            resolve(false);
+        };
+    });
+}
+
+function handleSocketMessage(message) {
+    const resolve = pendingTurns.get(message.id);
+    switch (message.type) {
+        case 'turn':
+        case 'error':
+            if (!resolve) {
+                if (message.type === 'error') console.error('Tutor socket:', message.detail);
+                break;
+            }
+            pendingTurns.delete(message.id);
+            if (message.type === 'error') addMessage(message.detail, false);
+            resolve(message.type === 'turn' ? message : false); // false: already reported
+            break;
+        case 'score_update':
+            showScoreUpdates(message.score_updates);
+            break;
+        // 'heartbeat': nothing to do, it only keeps the connection alive
+    }
+}
+
+function showScoreUpdates(updates) {
+    for (const update of updates || []) {
+        addMessage(`_Graded your answer on **${update.subtopic}**: ${Math.round(update.eval_score * 100)}% ` +
+                   `(topic score ${update.score})_`, false);
+    }
 }
 
 // Function to call the backend API
 async function callTutor(answer = null) {
+    if (!socket && socketSupported) await connectSocket(); // reconnect after a drop
+    if (socket) {
+        const id = ++nextTurnId;
+        const reply = new Promise(resolve => pendingTurns.set(id, resolve));
+        socket.send(JSON.stringify({ type: 'turn', id: id, answer: answer }));
+        const data = await reply;
+        if (data === null) addMessage('The tutor connection was interrupted. Please send your answer again.', false);
+        return data || null;
+    }
+
     try {
         const response = await fetch('/api/tutor', {
             method: 'POST',
@@ -55,6 +124,80 @@ async function callTutor(answer = null) {
     }
 }
 
+// One-shot onboarding: all questions arrive in one (ETag-cached) request, are asked
+// locally and submitted together; the reply is the first lesson.
+// Falls back to the step-by-step /api/tutor flow when unavailable.
+let onboarding = null; // { bundle, step, answers } while onboarding locally
+
+async function loadOnboarding() {
+    try {
+        const response = await fetch('/api/onboarding');
+        // Already onboarded (e.g. a page reload): continue with the regular flow
+        if (!response.ok || response.headers.get('X-Onboarded') === 'true') return null;
+        return { bundle: await response.json(), step: 0, answers: {} };
+    } catch (error) {
+        return null;
+    }
+}
+
+function currentOnboardingQuestion() {
+    const { bundle, step } = onboarding;
+    if (step < bundle.questions.length) return bundle.questions[step];
+    return { id: null, question: bundle.topic_question, options: bundle.topics };
+}
+
+function askOnboardingQuestion() {
+    const q = currentOnboardingQuestion();
+    const options = q.options.map((option, i) => `${i + 1}. ${option}`).join('\n');
+    addMessage(`**Question:**\n${q.question}\n\n${options}`, false);
+}
+
+function pickOption(q, text) {
+    const n = Number(text);
+    if (Number.isInteger(n) && n >= 1 && n <= q.options.length) return q.options[n - 1];
+    return q.options.find(option => option.toLowerCase() === text.toLowerCase()) || null;
+}
+
+async function handleOnboardingAnswer(text) {
+    const q = currentOnboardingQuestion();
+    const choice = pickOption(q, text);
+
+    if (q.id) {
+        if (!choice) {
+            addMessage('Please pick one of the options (its number or its text).', false);
+            return;
+        }
+        onboarding.answers[q.id] = choice;
+        onboarding.step++;
+        askOnboardingQuestion();
+        return;
+    }
+
+    // Topic: any text naming a topic works, the server matches it
+    let response, data;
+    try {
+        response = await fetch('/api/onboarding', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ answers: onboarding.answers, topic: choice || text })
+        });
+        data = await response.json();
+    } catch (error) {
+        // Network failure or a non-JSON reply (e.g. a proxy error page): let the learner retry the topic
+        console.error('Error:', error);
+        addMessage('Sorry, I could not reach the server. Please send your topic again.', false);
+        return;
+    }
+    if (response.status === 422) {
+        addMessage(data.detail, false);
+        return;
+    }
+    onboarding = null;
+    // 409 = this learner is already onboarded: continue with the regular flow
+    const step = response.ok ? data : await callTutor(null);
+    if (step) processStepData(step);
+}
+
 // Handler for user input submission
 async function handleInput(e) {
     e.preventDefault();
@@ -68,11 +211,15 @@ async function handleInput(e) {
     // Disable input while loading
     userInput.disabled = true;
 
-    // Call backend
-    const stepData = await callTutor(text);
-    
-    if (stepData) {
-        processStepData(stepData);
+    if (onboarding) {
+        await handleOnboardingAnswer(text);
+    } else {
+        // Call backend
+        const stepData = await callTutor(text);
+
+        if (stepData) {
+            processStepData(stepData);
+        }
     }
 
     userInput.disabled = false;
@@ -92,6 +239,9 @@ function processStepData(data) {
         personaIntent.textContent = data.intent;
     }
 
+    // Grades of earlier answers (also pushed over the socket as they complete)
+    showScoreUpdates(data.score_updates);
+
     // 2. Construct AI Response Message
     let messageContent = "";
 
@@ -142,6 +292,13 @@ async function startTutor() {
     // However, looking at `api.py`, it calls `tutor_step(input.answer)`.
     // If `tutor_step` blocks on `input()`, the API hangs.
     
+    await connectSocket();
+    onboarding = await loadOnboarding();
+    if (onboarding) {
+        askOnboardingQuestion();
+        return;
+    }
+
     addMessage("Starting assessment... (Note: CLI interaction might be required if not fully adapted)", false);
     
     // Attempt call